@@ -1,31 +1,202 @@
 """The Detailed Hello World Push integration."""
 from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
+import logging
+
+from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY, ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryError, ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv, discovery_flow
+from homeassistant.helpers.typing import ConfigType
 
 from . import hub
-from .const import DOMAIN
+from .capture import CaptureTransport, capture_path
+from .const import (
+    CAPTURE_MAX_BYTES,
+    DATA_SITE,
+    DEFAULT_RATED_POWER_W,
+    DEFAULT_STATE_INTERVAL_SECONDS,
+    DOMAIN,
+)
+from .control import PowerController
+from .discovery import DiscoveredDongle, async_probe_host
+from .exporter import FileSink, TelemetryExporter, create_sink
+from .push import SolplanetPushView
+from .services import async_setup_services
+from .site import Site
+from .transport import create_transport, load_register_map, load_setting_map
+
+_LOGGER = logging.getLogger(__name__)
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 # List of platforms to support. There should be a matching .py file for each,
 # eg <cover.py> and <sensor.py>
-PLATFORMS: list[str] = ["sensor"]
+PLATFORMS: list[str] = ["number", "sensor", "switch"]
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Solplanet component."""
+    # Inverters set up in push mode receive their data through this view.
+    hass.http.register_view(SolplanetPushView())
+    await async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Hello World from a config entry."""
+    unique_id = entry.data["inverter_id"].lower()
+    if entry.unique_id != unique_id:
+        # Entries created before unique ids were set, or with the serial in
+        # another case, would otherwise be offered again by discovery.
+        if any(
+            other.unique_id == unique_id
+            for other in hass.config_entries.async_entries(DOMAIN)
+            if other.entry_id != entry.entry_id
+        ):
+            raise ConfigEntryError(
+                f"Inverter {entry.data['inverter_id']} is already configured"
+            )
+        hass.config_entries.async_update_entry(entry, unique_id=unique_id)
+
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    # Every inverter is polled by one site wide coordinator.
+    site = domain_data.get(DATA_SITE)
+    if site is None:
+        site = domain_data[DATA_SITE] = Site(hass)
+
+    # With statistics imported in bulk, high frequency sensors only write their
+    # state at a coarse rate.
+    import_statistics = entry.options.get("import_statistics", False)
+    state_interval = (
+        entry.options.get("state_interval", DEFAULT_STATE_INTERVAL_SECONDS)
+        if import_statistics
+        else 0
+    )
+
+    settings = None
+    if setting_map := entry.options.get("setting_map"):
+        # Without a map verified for the inverter model nothing is written.
+        try:
+            settings = await hass.async_add_executor_job(
+                load_setting_map,
+                hass.config.path(setting_map),
+                entry.data.get("transport", "http"),
+            )
+        except (OSError, ValueError) as err:
+            _LOGGER.error("Power control disabled, invalid setting map: %s", err)
+    registers = None
+    if entry.data.get("transport") == "modbus":
+        # Modbus inverters are only read through a register map verified for
+        # the model.
+        try:
+            registers = await hass.async_add_executor_job(
+                load_register_map, hass.config.path(entry.data.get("register_map", ""))
+            )
+        except (OSError, ValueError) as err:
+            raise ConfigEntryError(f"Invalid register map: {err}") from err
+    transport = create_transport(hass, entry.data, settings, registers)
+    if entry.options.get("capture", False):
+        # Record every response of the dongle for replaying it offline.
+        capture = TelemetryExporter(
+            hass,
+            FileSink(
+                hass,
+                capture_path(hass, entry.data["inverter_id"]),
+                CAPTURE_MAX_BYTES,
+            ),
+        )
+        capture.async_start()
+        entry.async_on_unload(capture.async_stop)
+        transport = CaptureTransport(transport, capture, entry.data["inverter_id"])
+
     # Store an instance of the "connecting" class that does the work of speaking
     # with your actual devices.
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = hub.Hub(
-        hass, entry.data["host"], entry.data["inverter_id"]
+    entry_hub = hub.Hub(
+        hass,
+        entry.data["host"],
+        entry.data["inverter_id"],
+        push=entry.data.get("push", False),
+        transport=transport,
+        state_interval=state_interval,
+    )
+    await entry_hub.async_restore()
+    if entry_hub.stale:
+        # Come up from the values cached before the restart; the first live
+        # poll is requested once the entities exist.
+        site.add_hub(entry_hub)
+    else:
+        try:
+            await site.async_add_hub(entry_hub)
+        except ConnectionError as err:
+            await entry_hub.async_close()
+            raise ConfigEntryNotReady(err) from err
+    entry_hub.controller = PowerController(
+        hass, entry_hub, entry.options.get("rated_power", DEFAULT_RATED_POWER_W)
     )
+    domain_data[entry.entry_id] = entry_hub
+
+    if import_statistics:
+        # Imported here so the recorder is only loaded when it is used.
+        from .statistics_import import StatisticsImporter
+
+        importer = StatisticsImporter(hass, entry_hub)
+        importer.async_start()
+        entry.async_on_unload(importer.async_stop)
+    if entry.options.get("exporter", "none") != "none":
+        exporter = TelemetryExporter(hass, create_sink(hass, entry.options))
+        exporter.async_start()
+        entry.async_on_unload(exporter.async_stop)
+        entry.async_on_unload(
+            entry_hub.async_add_listener(lambda: exporter.add(entry_hub))
+        )
+        entry_hub.exporter = exporter
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     # This creates each HA object for each platform your device requires.
     # It's done by calling the `async_setup_entry` function in each platform module.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    if entry_hub.stale:
+        entry.async_create_background_task(
+            hass,
+            site.coordinator.async_request_refresh(),
+            f"{DOMAIN} warm start refresh {entry.entry_id}",
+        )
+    if entry.data.get("transport", "http") == "http":
+        entry.async_create_background_task(
+            hass,
+            async_discover_bus(hass, entry.data["host"]),
+            f"{DOMAIN} bus discovery {entry.entry_id}",
+        )
     return True
 
 
+async def async_discover_bus(hass: HomeAssistant, host: str) -> None:
+    """Offer the inverters chained to the dongle at host that are not set up.
+
+    Also learns the order the dongle lists them in, which its sweep follows.
+    """
+    dongle = await async_probe_host(hass, host)
+    if dongle is None:
+        return
+    configured = {
+        entry.unique_id for entry in hass.config_entries.async_entries(DOMAIN)
+    }
+    for inverter_id in dongle.inverter_ids:
+        if inverter_id.lower() not in configured:
+            discovery_flow.async_create_flow(
+                hass,
+                DOMAIN,
+                context={"source": SOURCE_INTEGRATION_DISCOVERY},
+                data=DiscoveredDongle(dongle.host, [inverter_id]),
+            )
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload an entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # This is called when an entry/configured device is to be removed. The class
@@ -33,6 +204,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # details
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        site = hass.data[DOMAIN][DATA_SITE]
+        entry_hub = hass.data[DOMAIN].pop(entry.entry_id)
+        site.remove_hub(entry.entry_id, entry_hub)
+        # Hand the inverter back to its own control.
+        await entry_hub.controller.async_disable()
+        await entry_hub.async_close()
+        if not site.hubs:
+            hass.data[DOMAIN].pop(DATA_SITE)
 
     return unload_ok
@@ -0,0 +1,50 @@
+"""Circuit breaker for requests to an unreachable inverter."""
+from __future__ import annotations
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop polling an inverter that keeps failing and probe it with backoff.
+
+    After `failure_threshold` consecutive failed polls the breaker opens and
+    polls fail fast without any request. Once the backoff has passed, a single
+    probe poll is let through (half-open). If it succeeds the breaker closes,
+    otherwise it opens again with twice the backoff, up to `max_backoff`.
+    """
+
+    def __init__(
+        self, failure_threshold: int, min_backoff: float, max_backoff: float
+    ) -> None:
+        """Initialize breaker."""
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self._failure_threshold = failure_threshold
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._backoff = min_backoff
+
+    def allow_request(self, now: float) -> bool:
+        """Return True if a poll may be sent at `now`."""
+        if self.state == OPEN and now >= self.retry_at:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record_success(self) -> None:
+        """Record a successful poll."""
+        self.state = CLOSED
+        self.failures = 0
+        self._backoff = self._min_backoff
+
+    def record_failure(self, now: float) -> None:
+        """Record a failed poll at `now`."""
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self._backoff = min(self._backoff * 2, self._max_backoff)
+        elif self.failures < self._failure_threshold:
+            return
+        self.state = OPEN
+        self.retry_at = now + self._backoff
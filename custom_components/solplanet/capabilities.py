@@ -0,0 +1,89 @@
+"""Detection of the subsystems an inverter actually has."""
+from __future__ import annotations
+
+from typing import Any
+
+from .sensor_descriptions import SensorDescription
+
+
+class Capabilities:
+    """Endpoints and raw fields an inverter reported.
+
+    `endpoints` maps every endpoint that answered with data to the length of
+    each field it reported (1 for plain values), so e.g. the number of MPPT
+    strings is the length of the inverter's `vpv` list. `pending` endpoints
+    have not answered with data yet, but have not failed or answered empty
+    often enough to be ruled out either; they are assumed to have every
+    field. Any other endpoint is absent, e.g. the battery endpoint of an
+    inverter without a battery.
+    """
+
+    __slots__ = ("endpoints", "pending")
+
+    def __init__(
+        self,
+        endpoints: dict[str, dict[str, int]],
+        pending: set[str] | None = None,
+    ) -> None:
+        """Initialize capabilities."""
+        self.endpoints = endpoints
+        self.pending = pending or set()
+
+    @classmethod
+    def from_payloads(
+        cls, payloads: dict[str, Any], pending: set[str] | None = None
+    ) -> Capabilities:
+        """Detect the capabilities from one payload per endpoint."""
+        return cls(
+            {
+                endpoint: {
+                    field: len(value) if isinstance(value, list) else 1
+                    for field, value in payload.items()
+                    if value is not None
+                }
+                for endpoint, payload in payloads.items()
+                if isinstance(payload, dict) and payload
+            },
+            pending,
+        )
+
+    @property
+    def mppt_count(self) -> int:
+        """Return the number of PV strings of the inverter."""
+        return self.endpoints.get("inverter", {}).get("vpv", 0)
+
+    def _present(self, endpoint: str, field: str | None, index: int | None) -> bool:
+        """Return whether the raw value, or the whole endpoint, is present."""
+        if endpoint in self.pending:
+            return True
+        fields = self.endpoints.get(endpoint)
+        if fields is None:
+            return False
+        if field is None:
+            return True
+        return field in fields and (index is None or index < fields[field])
+
+    def has_endpoint(self, endpoint: str) -> bool:
+        """Return whether endpoint is present or still pending."""
+        return self._present(endpoint, None, None)
+
+    def supports(self, description: SensorDescription) -> bool:
+        """Return whether the value of description is available."""
+        if description.requires is not None and not self._present(
+            *description.requires
+        ):
+            return False
+        if description.endpoint is None:
+            return True
+        return self._present(
+            description.endpoint, description.field, description.index
+        )
+
+    def as_dict(self) -> dict:
+        """Return the capabilities for storage."""
+        return {"endpoints": self.endpoints, "pending": sorted(self.pending)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Capabilities:
+        """Return capabilities restored from storage."""
+        return cls(data["endpoints"], set(data.get("pending", ())))
@@ -0,0 +1,181 @@
+"""Capture of the dongle's responses, and their replay through a transport.
+
+A capture is a JSON lines file, appended to while capturing, with one line
+per response:
+
+    {"t": <unix time>, "sn": <serial>, "ep": <endpoint>, "s": <status>, "b": <body>}
+
+with the HTTP status and the body as received, its bytes as Latin-1
+characters, or "e": <error> instead of "s" and "b" for a request that got no
+response. Replaying decodes the body like a live response, so bodies that
+failed to decode fail the same way. Once the file reaches CAPTURE_MAX_BYTES
+it is moved to <file>.1, replacing the previous one.
+"""
+from __future__ import annotations
+
+from collections import deque
+from pathlib import Path
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import json_dumps
+from homeassistant.util.json import json_loads
+
+from .const import DOMAIN
+from .exporter import TelemetryExporter
+from .transport import Transport, TransportError, decode_response
+
+
+def capture_path(hass: HomeAssistant, inverter_id: str) -> str:
+    """Return the file the responses of an inverter are captured to."""
+    return hass.config.path(f"{DOMAIN}_capture_{inverter_id.lower()}.jsonl")
+
+
+class CaptureTransport(Transport):
+    """Record every response of another transport to a capture file.
+
+    Lines go through a TelemetryExporter writing to the file, so capturing
+    never waits for the disk.
+    """
+
+    def __init__(
+        self, transport: Transport, exporter: TelemetryExporter, inverter_id: str
+    ) -> None:
+        """Initialize transport."""
+        self._transport = transport
+        self._exporter = exporter
+        self._inverter_id = inverter_id
+
+    def _record(self, endpoint: str, **fields: Any) -> None:
+        self._exporter.add_lines(
+            [
+                json_dumps(
+                    {"t": time.time(), "sn": self._inverter_id, "ep": endpoint} | fields
+                )
+            ]
+        )
+
+    async def fetch(self, endpoint: str) -> tuple[dict[str, Any], int]:
+        """Return the payload of endpoint and record its raw response."""
+        try:
+            status, body = await self._transport.fetch_raw(endpoint)
+        except TransportError as err:
+            self._record(endpoint, e=str(err))
+            raise
+        # Latin-1 maps every byte to one character, so bodies that are not
+        # UTF-8, or not JSON, are kept byte for byte.
+        self._record(endpoint, s=status, b=body.decode("latin-1"))
+        return decode_response(status, body)
+
+    @property
+    def settings(self) -> dict[str, dict] | None:
+        """Return the setting map of the captured transport."""
+        return self._transport.settings
+
+    async def write(self, setting: str, value: int) -> None:
+        """Write a setting through the captured transport."""
+        await self._transport.write(setting, value)
+
+    async def read_setting(self, setting: str) -> int:
+        """Read a setting through the captured transport."""
+        return await self._transport.read_setting(setting)
+
+    async def close(self) -> None:
+        """Close the captured transport."""
+        await self._transport.close()
+
+
+def load_capture(path: str, inverter_id: str | None = None) -> list[dict]:
+    """Return the records of a capture, of one inverter if given, in order.
+
+    Includes the part rotated to path.1, if any. Does blocking I/O. A line cut
+    off by a crash while capturing is skipped.
+    """
+    records = []
+    paths = [Path(path)]
+    if (rotated := Path(f"{path}.1")).exists():
+        paths.insert(0, rotated)
+    for file_path in paths:
+        with file_path.open(encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json_loads(line)
+                except ValueError:
+                    continue
+                if inverter_id is None or record["sn"].lower() == inverter_id.lower():
+                    records.append(record)
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+class ReplayTransport(Transport):
+    """Responses of a capture, replayed in place of the dongle.
+
+    Every endpoint answers with its latest response at the current time into
+    the capture, repeating it until the next one is due, and fails after the
+    last one. With `realtime` the capture plays at the speed it was recorded;
+    otherwise its time is whatever `now` is set to, e.g. by tools/replay.py
+    stepping through it as fast as possible.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str,
+        inverter_id: str,
+        realtime: bool = True,
+    ) -> None:
+        """Initialize transport."""
+        self._hass = hass
+        self._path = path
+        self._inverter_id = inverter_id
+        self._realtime = realtime
+        # Unix time into the capture when not replaying in real time.
+        self.now = 0.0
+        # Responses not replayed yet by endpoint, loaded on the first request.
+        self._records: dict[str, deque[dict]] | None = None
+        # Response last replayed by endpoint, repeated until the next is due.
+        self._last: dict[str, dict] = {}
+        self._start_time = 0.0
+        self._started = 0.0
+
+    async def _async_load(self) -> dict[str, deque[dict]]:
+        try:
+            records = await self._hass.async_add_executor_job(
+                load_capture, self._path, self._inverter_id
+            )
+        except OSError as err:
+            raise TransportError(err) from err
+        by_endpoint: dict[str, deque[dict]] = {}
+        for record in records:
+            by_endpoint.setdefault(record["ep"], deque()).append(record)
+        self._start_time = records[0]["t"] if records else 0.0
+        self._started = time.monotonic()
+        return by_endpoint
+
+    async def fetch(self, endpoint: str) -> tuple[dict[str, Any], int]:
+        """Return the captured payload of endpoint and its size."""
+        return decode_response(*await self.fetch_raw(endpoint))
+
+    async def fetch_raw(self, endpoint: str) -> tuple[int, bytes]:
+        """Return the captured HTTP status and body of endpoint."""
+        if self._records is None:
+            self._records = await self._async_load()
+        records = self._records.get(endpoint)
+        if not records:
+            raise TransportError(f"No more captured {endpoint} responses")
+        if self._realtime:
+            now = self._start_time + time.monotonic() - self._started
+        else:
+            now = self.now
+        # Skip to the latest response at this time into the capture.
+        while len(records) > 1 and records[1]["t"] <= now:
+            records.popleft()
+        if records[0]["t"] > now and endpoint in self._last:
+            record = self._last[endpoint]
+        else:
+            record = self._last[endpoint] = records.popleft()
+        if "e" in record:
+            raise TransportError(record["e"])
+        return record["s"], record["b"].encode("latin-1")
@@ -6,13 +6,26 @@ import logging
 import voluptuous as vol
 
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
+from homeassistant.components.dhcp import DhcpServiceInfo
+from homeassistant.core import HomeAssistant, callback
 
-from .const import DOMAIN  # pylint:disable=unused-import
+from .const import DEFAULT_RATED_POWER_W, DEFAULT_STATE_INTERVAL_SECONDS, DOMAIN
+from .discovery import DiscoveredDongle, async_discover, async_probe_host
+from .exporter import EXPORTERS
 from .hub import Hub
+from .transport import (
+    MODBUS_FRAMINGS,
+    TRANSPORTS,
+    create_transport,
+    load_register_map,
+    load_setting_map,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# Choice of the discovery step for entering an inverter by hand.
+MANUAL_ENTRY = "manual"
+
 # This is the schema that used to display the UI to the user. This simple
 # schema has a single required host field, but it could include a number of fields
 # such as username, password etc. See other components in the HA core code for
@@ -28,6 +41,11 @@ DATA_SCHEMA = vol.Schema(
     {
         vol.Required("host"): str,
         vol.Required("inverter_id"): str,
+        vol.Optional("push", default=False): bool,
+        vol.Optional("transport", default="http"): vol.In(TRANSPORTS),
+        vol.Optional("modbus_unit", default=3): int,
+        vol.Optional("modbus_framing", default="tcp"): vol.In(MODBUS_FRAMINGS),
+        vol.Optional("register_map", default=""): str,
     }
 )
 
@@ -45,10 +63,25 @@ async def validate_input(hass: HomeAssistant, data: dict) -> None:
     if len(data["host"]) < 3:
         raise InvalidHost
 
-    hub = Hub(hass, data["host"], data["inverter_id"])
-    # The dummy hub provides a `test_connection` method to ensure it's working
-    # as expected
-    result = await hub.test_connection()
+    registers = None
+    if data.get("transport") == "modbus":
+        try:
+            registers = await hass.async_add_executor_job(
+                load_register_map, hass.config.path(data.get("register_map", ""))
+            )
+        except (OSError, ValueError) as err:
+            raise InvalidRegisterMap from err
+
+    hub = Hub(
+        hass,
+        data["host"],
+        data["inverter_id"],
+        transport=create_transport(hass, data, registers=registers),
+    )
+    try:
+        result = await hub.test_connection()
+    finally:
+        await hub.async_close()
     if not result:
         # If there is an error, raise an exception to notify HA that there was a
         # problem. The UI will also show there was a problem
@@ -76,8 +109,88 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     # changes.
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_PUSH
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+    def __init__(self) -> None:
+        """Initialize flow."""
+        self._discovered: dict[str, str] = {}
+        self._suggested: dict[str, str] = {}
+
     async def async_step_user(self, user_input=None):
-        """Handle the initial step."""
+        """Handle the initial step, picking one of the discovered inverters."""
+        if user_input is not None:
+            if user_input["device"] == MANUAL_ENTRY:
+                return await self.async_step_manual()
+            self._suggested = {
+                "host": self._discovered[user_input["device"]],
+                "inverter_id": user_input["device"],
+            }
+            return await self.async_step_manual()
+
+        dongles = await async_discover(self.hass)
+        configured = self._async_current_ids()
+        self._discovered = {
+            inverter_id: dongle.host
+            for dongle in dongles
+            for inverter_id in dongle.inverter_ids
+            if inverter_id.lower() not in configured
+        }
+        if not self._discovered:
+            return await self.async_step_manual()
+
+        devices = {
+            inverter_id: f"{inverter_id} ({host})"
+            for inverter_id, host in self._discovered.items()
+        }
+        devices[MANUAL_ENTRY] = "Enter manually"
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({vol.Required("device"): vol.In(devices)}),
+        )
+
+    async def async_step_dhcp(self, discovery_info: DhcpServiceInfo):
+        """Handle a dongle found by DHCP."""
+        dongle = await async_probe_host(self.hass, discovery_info.ip)
+        if dongle is None or not dongle.inverter_ids:
+            return self.async_abort(reason="not_supported")
+        return await self._async_step_discovered(dongle)
+
+    async def async_step_integration_discovery(self, discovery_info: DiscoveredDongle):
+        """Handle an inverter found on the bus of a configured dongle."""
+        return await self._async_step_discovered(discovery_info)
+
+    async def _async_step_discovered(self, dongle: DiscoveredDongle):
+        """Offer the first inverter of dongle that is not configured yet."""
+        configured = self._async_current_ids()
+        for inverter_id in dongle.inverter_ids:
+            if inverter_id.lower() not in configured:
+                break
+        else:
+            # Follow the dongle if its address changed.
+            for entry in self._async_current_entries():
+                if (
+                    entry.unique_id
+                    in {inverter_id.lower() for inverter_id in dongle.inverter_ids}
+                    and entry.data.get("transport", "http") == "http"
+                    and entry.data["host"] != dongle.host
+                ):
+                    self.hass.config_entries.async_update_entry(
+                        entry, data={**entry.data, "host": dongle.host}
+                    )
+            return self.async_abort(reason="already_configured")
+
+        await self.async_set_unique_id(inverter_id.lower())
+        self._abort_if_unique_id_configured()
+        self.context["title_placeholders"] = {"inverter_id": inverter_id}
+        self._suggested = {"host": dongle.host, "inverter_id": inverter_id}
+        return await self.async_step_manual()
+
+    async def async_step_manual(self, user_input=None):
+        """Handle the connection details of one inverter."""
         # This goes through the steps to take the user through the setup process.
         # Using this it is possible to update the UI and prompt for additional
         # information. This example provides a single form (built from `DATA_SCHEMA`),
@@ -86,6 +199,10 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # `validate_input` above.
         errors = {}
         if user_input is not None:
+            # Unique ids are the serial in lower case, like the hub ids.
+            user_input["inverter_id"] = user_input["inverter_id"].strip()
+            await self.async_set_unique_id(user_input["inverter_id"].lower())
+            self._abort_if_unique_id_configured()
             try:
                 await validate_input(self.hass, user_input)
 
@@ -94,6 +211,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 )
             except CannotConnect:
                 errors["base"] = "cannot_connect"
+            except InvalidRegisterMap:
+                errors["register_map"] = "invalid_register_map"
             except InvalidHost:
                 # The error string is set here, and should be translated.
                 # This example does not currently cover translations, see the
@@ -106,7 +225,81 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         # If there is no user input or there were errors, show the form again, including any errors that were found with the input.
         return self.async_show_form(
-            step_id="user", data_schema=DATA_SCHEMA, errors=errors
+            step_id="manual",
+            data_schema=self.add_suggested_values_to_schema(
+                DATA_SCHEMA, user_input or self._suggested
+            ),
+            errors=errors,
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of an inverter."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        errors = {}
+        if user_input is not None:
+            if user_input["exporter"] != "none" and not user_input.get(
+                "export_target"
+            ):
+                errors["export_target"] = "export_target_required"
+            elif setting_map := user_input.get("setting_map"):
+                try:
+                    await self.hass.async_add_executor_job(
+                        load_setting_map,
+                        self.hass.config.path(setting_map),
+                        self.config_entry.data.get("transport", "http"),
+                    )
+                except (OSError, ValueError):
+                    errors["setting_map"] = "invalid_setting_map"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            errors=errors,
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        "import_statistics",
+                        default=options.get("import_statistics", False),
+                    ): bool,
+                    vol.Optional(
+                        "state_interval",
+                        default=options.get(
+                            "state_interval", DEFAULT_STATE_INTERVAL_SECONDS
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(
+                        "rated_power",
+                        default=options.get("rated_power", DEFAULT_RATED_POWER_W),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=100)),
+                    vol.Optional(
+                        "setting_map",
+                        description={"suggested_value": options.get("setting_map")},
+                    ): str,
+                    vol.Optional(
+                        "exporter", default=options.get("exporter", "none")
+                    ): vol.In(EXPORTERS),
+                    vol.Optional(
+                        "export_target",
+                        description={"suggested_value": options.get("export_target")},
+                    ): str,
+                    vol.Optional(
+                        "export_token",
+                        description={"suggested_value": options.get("export_token")},
+                    ): str,
+                    vol.Optional(
+                        "capture", default=options.get("capture", False)
+                    ): bool,
+                }
+            ),
         )
 
 
@@ -116,3 +309,7 @@ class CannotConnect(exceptions.HomeAssistantError):
 
 class InvalidHost(exceptions.HomeAssistantError):
     """Error to indicate there is an invalid hostname."""
+
+
+class InvalidRegisterMap(exceptions.HomeAssistantError):
+    """Error to indicate the Modbus register map could not be read."""
@@ -2,4 +2,106 @@
 
 DOMAIN = "solplanet"
 
+# Key of the shared Site in hass.data[DOMAIN], next to the hubs by entry id.
+DATA_SITE = "site"
+# Key of the dongles by host in hass.data[DOMAIN], see dongle.Dongle.
+DATA_DONGLES = "dongles"
+# Key of the running profiler in hass.data[DOMAIN], see the profile service.
+DATA_PROFILER = "profiler"
+
+# Base tick of the coordinator. Each endpoint is polled on its own adaptive
+# schedule (see POLL_INTERVALS) and the coordinator only wakes up when the
+# next endpoint is due, never more often than this.
 UPDATE_INTERVAL_SECONDS = 1
+
+# (fastest, slowest) poll interval in seconds for each endpoint. Endpoints
+# slow down while their values are steady and speed up again on change.
+POLL_INTERVALS = {
+    "inverter": (1, 10),
+    "meter": (1, 10),
+    "battery": (5, 60),
+}
+
+# Poll interval used while the inverter reports no output, e.g. at night.
+IDLE_POLL_INTERVAL_SECONDS = 60
+
+# Upper bound for a single request to the dongle, counted from when it gets
+# its turn, so time queued behind other requests is not part of it.
+REQUEST_TIMEOUT_SECONDS = 4
+
+# Pause between the end of one request to a dongle and the start of the next.
+# The WiFi sticks tend to lock up when requests overlap or follow too closely.
+MIN_REQUEST_SPACING_SECONDS = 0.05
+
+# Number of dongles polled at the same time by the site coordinator.
+MAX_CONCURRENT_POLLS = 4
+
+# Time a dongle gets to poll the inverters on its bus, one after the other, in
+# one update. Inverters not reached in time are polled first in the next one.
+# One more poll may start just before it runs out.
+SWEEP_BUDGET_SECONDS = 5
+
+# Consecutive failed polls after which an inverter is considered offline, and
+# the (first, longest) wait in seconds before probing it again.
+OFFLINE_FAILURE_THRESHOLD = 3
+OFFLINE_BACKOFF_SECONDS = (5, 300)
+
+# In push mode, an endpoint is only polled if nothing was pushed for this long.
+PUSH_POLL_FALLBACK_SECONDS = 60
+# How long the addresses of a host name pushes are accepted from are kept
+# before it is resolved again.
+PUSH_RESOLVE_SECONDS = 300
+
+# Longest interval between two power samples that is still integrated into
+# the locally computed energy totals, and how often those totals are saved.
+ENERGY_MAX_GAP_SECONDS = 300
+ENERGY_SAVE_DELAY_SECONDS = 60
+
+# How often the last payloads are saved for a warm start after a restart.
+CACHE_SAVE_DELAY_SECONDS = 300
+
+# Failed or non-JSON object answers in a row after which an endpoint that never
+# answered with data is taken to be absent, e.g. the battery of an inverter
+# without one. Empty answers do not count.
+CAPABILITY_MISSED_POLLS = 10
+
+# Seconds of full resolution sample history per inverter, at one sample per
+# UPDATE_INTERVAL_SECONDS. The hourly statistics import reads the whole
+# previous hour shortly after it ends; the rest is margin.
+SAMPLE_HISTORY_SECONDS = 2 * 3600
+
+# Seconds between state writes of power, voltage and current sensors when
+# long-term statistics are imported from the sample history instead.
+DEFAULT_STATE_INTERVAL_SECONDS = 60
+
+# LAN discovery probes this many hosts at once, each with a short timeout.
+# Networks larger than DISCOVERY_MAX_HOSTS are narrowed to the block around
+# Home Assistant's own address.
+DISCOVERY_CONCURRENCY = 128
+DISCOVERY_TIMEOUT_SECONDS = 1.5
+DISCOVERY_MAX_HOSTS = 256
+
+# Closed loop power control, see control.py. Gains are in W of setpoint change
+# per W of error (and per W second for the integral part). The inverter and
+# battery follow a setpoint by the next meter reading, so integrating the
+# error alone corrects it within one fast meter poll; a proportional part
+# would only kick the setpoint back on the poll after. Setpoints are only
+# written once they moved by CONTROL_WRITE_DEADBAND_W, and at most every
+# CONTROL_WRITE_INTERVAL_SECONDS per setting, less than the meter poll.
+CONTROL_KP = 0.0
+CONTROL_KI = 1.0
+CONTROL_WRITE_DEADBAND_W = 50
+CONTROL_WRITE_INTERVAL_SECONDS = 0.5
+DEFAULT_RATED_POWER_W = 5000
+
+# Telemetry export, see exporter.py: lines per batch, seconds between flushes
+# of partial batches, lines queued at most before the oldest are dropped and
+# seconds a batch may take to write to InfluxDB.
+EXPORT_BATCH_LINES = 500
+EXPORT_FLUSH_SECONDS = 5
+EXPORT_QUEUE_LINES = 20000
+EXPORT_TIMEOUT_SECONDS = 10
+
+# Size at which a capture file of the dongle's responses is moved to <file>.1,
+# see capture.py, so capturing takes at most about twice this on disk.
+CAPTURE_MAX_BYTES = 100 * 1024 * 1024
@@ -0,0 +1,222 @@
+"""Closed loop export limiting and peak shaving."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    CONTROL_KI,
+    CONTROL_KP,
+    CONTROL_WRITE_DEADBAND_W,
+    CONTROL_WRITE_INTERVAL_SECONDS,
+    POLL_INTERVALS,
+)
+from .hub import Hub
+from .transport import SETTINGS, TransportError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PIController:
+    """PI controller in velocity form, clamped to [minimum, maximum].
+
+    Every update moves the output by the change of the error times `kp` plus
+    the error times `ki` and the elapsed time. Clamping the output itself
+    keeps the controller from winding up while the setpoint is saturated.
+    """
+
+    def __init__(self, kp: float, ki: float, minimum: float, maximum: float) -> None:
+        """Initialize controller."""
+        self.kp = kp
+        self.ki = ki
+        self.minimum = minimum
+        self.maximum = maximum
+        self.output = maximum
+        self._last_error = 0.0
+
+    def reset(self, output: float) -> None:
+        """Restart from output, e.g. the setpoint currently in effect.
+
+        The first update after a reset applies the full proportional action.
+        """
+        self.output = min(max(output, self.minimum), self.maximum)
+        self._last_error = 0.0
+
+    def update(self, error: float, dt: float) -> float:
+        """Return the new output for error, `dt` seconds after the last one."""
+        change = self.kp * (error - self._last_error) + self.ki * error * dt
+        self._last_error = error
+        self.output = min(max(self.output + change, self.minimum), self.maximum)
+        return self.output
+
+
+class PowerController:
+    """Keep the grid power of one inverter within export and import limits.
+
+    Runs on every new set of values of the hub, i.e. right after each meter
+    poll or push, without going through the state machine. The export limit
+    is held by lowering the inverter's power_limit; the import limit (peak
+    shaving) by discharging the battery, which is handed back to self use
+    whenever it is not needed. Limits are in W, None means no limit. The
+    settings in effect when control starts are restored when it stops.
+    """
+
+    def __init__(self, hass: HomeAssistant, hub: Hub, rated_power: float) -> None:
+        """Initialize controller."""
+        self._hass = hass
+        self._hub = hub
+        self.rated_power = rated_power
+        self.enabled = False
+        self.export_limit: float | None = None
+        self.import_limit: float | None = None
+        self._export = PIController(CONTROL_KP, CONTROL_KI, 0, rated_power)
+        self._import = PIController(CONTROL_KP, CONTROL_KI, 0, rated_power)
+        # Time of the meter reading the setpoints were last updated from.
+        self._last_update: float | None = None
+        # Last written value and time by setting.
+        self._written: dict[str, tuple[float, float]] = {}
+        # Settings in effect before control started, restored when it stops.
+        self._restore: dict[str, int] = {}
+        self._pending: dict[str, int] = {}
+        self._writer: asyncio.Task | None = None
+        self._unsub = None
+
+    async def async_enable(self) -> None:
+        """Start controlling.
+
+        Raises HomeAssistantError if the inverter has no setting map, or the
+        settings to restore later cannot be read.
+        """
+        if self.enabled:
+            return
+        if not self._hub.writable:
+            raise HomeAssistantError(
+                f"No setting map configured for inverter {self._hub.hub_id}"
+            )
+        restore = {}
+        for setting in self._hub.settings:
+            try:
+                restore[setting] = await self._hub.async_read_setting(setting)
+            except (TransportError, TimeoutError) as err:
+                raise HomeAssistantError(
+                    f"Unable to read {setting} of inverter {self._hub.hub_id}: {err}"
+                ) from err
+        self._restore = restore
+        self.enabled = True
+        self._last_update = None
+        self._hub.set_fast_poll("meter", True)
+        self._unsub = self._hub.async_add_listener(self._async_on_values)
+
+    async def async_disable(self) -> None:
+        """Stop controlling and hand the inverter back to its own control."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._unsub()
+        self._unsub = None
+        self._hub.set_fast_poll("meter", False)
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+        self._pending = {
+            setting: value
+            for setting, value in self._restore.items()
+            if setting in self._written
+        }
+        await self._async_write_pending(force=True)
+        self._written.clear()
+
+    @callback
+    def _async_on_values(self) -> None:
+        """Update the setpoints from the latest meter reading."""
+        data = self._hub.data
+        grid = data["meter"].get("grid_power")
+        read_at = self._hub.updated_at.get("meter")
+        if (
+            grid is None
+            or not self._hub.online
+            or read_at is None
+            or read_at == self._last_update
+        ):
+            # Only act on new meter readings; polls of the other endpoints
+            # would integrate the same error again.
+            return
+        grid *= 1000
+        # A setpoint shows in the next meter reading, so each reading is
+        # integrated over at most the fast meter poll interval; a late one
+        # does not move the setpoints further than a timely one.
+        dt = POLL_INTERVALS["meter"][0]
+        if self._last_update is None:
+            # Start from what the inverter and battery are doing right now.
+            if (power_out := data["inverter"].get("power_out")) is not None:
+                self._export.reset(power_out * 1000)
+            self._import.reset(max(data["battery"].get("power") or 0, 0) * 1000)
+        else:
+            dt = min(read_at - self._last_update, dt)
+        self._last_update = read_at
+
+        if self.export_limit is not None:
+            # Negative when exporting more than allowed.
+            power_limit = self._export.update(grid + self.export_limit, dt)
+            self._pending["power_limit"] = round(power_limit)
+        elif "power_limit" in self._written:
+            self._pending["power_limit"] = self._restore["power_limit"]
+
+        if self.import_limit is not None and data["battery"].get("power") is not None:
+            # Positive when importing more than allowed.
+            discharge = self._import.update(grid - self.import_limit, dt)
+            if discharge > 0:
+                self._pending["battery_power"] = round(discharge)
+                self._pending["battery_mode"] = 1
+            else:
+                self._pending["battery_mode"] = 0
+        elif "battery_mode" in self._written:
+            for setting in ("battery_power", "battery_mode"):
+                if setting in self._restore:
+                    self._pending[setting] = self._restore[setting]
+
+        if self._pending and (self._writer is None or self._writer.done()):
+            self._writer = self._hass.async_create_background_task(
+                self._async_write_pending(), f"solplanet control {self._hub.hub_id}"
+            )
+
+    async def _async_write_pending(self, force: bool = False) -> None:
+        """Write the setpoints that moved enough, rate limited per setting."""
+        pending, self._pending = self._pending, {}
+        now = time.monotonic()
+        # In SETTINGS order, so the battery setpoint is in place before the
+        # battery mode that makes the battery follow it.
+        for setting in SETTINGS:
+            if (value := pending.get(setting)) is None:
+                continue
+            if (
+                setting == "battery_mode"
+                and value == 1
+                and "battery_power" in self._pending
+            ):
+                # The setpoint was not written yet.
+                self._pending.setdefault(setting, value)
+                continue
+            if not force and (last := self._written.get(setting)) is not None:
+                last_value, written_at = last
+                if abs(value - last_value) < (
+                    1 if setting == "battery_mode" else CONTROL_WRITE_DEADBAND_W
+                ):
+                    continue
+                if now - written_at < CONTROL_WRITE_INTERVAL_SECONDS:
+                    # Written with the next reading instead.
+                    self._pending.setdefault(setting, value)
+                    continue
+            try:
+                await self._hub.async_write(setting, value)
+            except (TransportError, TimeoutError) as err:
+                _LOGGER.warning(
+                    "Error writing %s to %s: %s", setting, self._hub.hub_id, err
+                )
+                if setting == "battery_power" and not force:
+                    self._pending.setdefault(setting, value)
+                continue
+            self._written[setting] = (value, time.monotonic())
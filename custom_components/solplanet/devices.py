@@ -51,3 +51,11 @@ class Solar(DeviceBase):
     def __init__(self, inverter_id: str, hub_name: str) -> None:
         """Initialize a meter device."""
         super().__init__(f"{inverter_id}_solar", f"{hub_name} Solar")
+
+
+class Site(DeviceBase):
+    """Site totals information class."""
+
+    def __init__(self) -> None:
+        """Initialize the site device."""
+        super().__init__("site", "Solplanet Site")
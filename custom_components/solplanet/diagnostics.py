@@ -0,0 +1,24 @@
+"""Diagnostics support for Solplanet."""
+from __future__ import annotations
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"host", "inverter_id", "export_token"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Return diagnostics for a config entry."""
+    hub = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "capabilities": hub.capabilities and hub.capabilities.as_dict(),
+        "metrics": hub.metrics.as_dict(),
+        "exporter": hub.exporter and hub.exporter.as_dict(),
+        "data": hub.data,
+    }
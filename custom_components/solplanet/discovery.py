@@ -0,0 +1,133 @@
+"""Discovery of Solplanet dongles on the local network."""
+from __future__ import annotations
+
+import asyncio
+from asyncio import timeout
+from dataclasses import dataclass
+import ipaddress
+import logging
+
+import aiohttp
+
+from homeassistant.components import network
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util.json import json_loads
+
+from .const import (
+    DATA_DONGLES,
+    DISCOVERY_CONCURRENCY,
+    DISCOVERY_MAX_HOSTS,
+    DISCOVERY_TIMEOUT_SECONDS,
+    DOMAIN,
+)
+from .transport import DEFAULT_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DiscoveredDongle:
+    """A dongle that answered on the network, with its inverters."""
+
+    host: str
+    inverter_ids: list[str]
+
+
+async def async_probe(
+    session: aiohttp.ClientSession,
+    host: str,
+    request_timeout: float = DISCOVERY_TIMEOUT_SECONDS,
+) -> DiscoveredDongle | None:
+    """Return the dongle at host, or None if there is none.
+
+    The dongle lists its inverters, with their serial numbers, at
+    getdev.cgi?device=2.
+    """
+    base_url = f"http://{host}" if ":" in host else f"http://{host}:{DEFAULT_PORT}"
+    try:
+        async with timeout(request_timeout):
+            async with session.get(f"{base_url}/getdev.cgi?device=2") as response:
+                response.raise_for_status()
+                payload = json_loads(await response.read())
+    except (aiohttp.ClientError, TimeoutError, ValueError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("inv"), list):
+        return None
+    inverter_ids = [
+        str(inverter["isn"])
+        for inverter in payload["inv"]
+        if isinstance(inverter, dict) and inverter.get("isn")
+    ]
+    return DiscoveredDongle(host, inverter_ids)
+
+
+async def async_probe_host(
+    hass: HomeAssistant,
+    host: str,
+    request_timeout: float = DISCOVERY_TIMEOUT_SECONDS,
+) -> DiscoveredDongle | None:
+    """Return the dongle at host, probing through its gate if it is in use.
+
+    The order the dongle lists its inverters in is the order a dongle in use
+    polls them.
+    """
+    session = async_get_clientsession(hass)
+    address = host.rsplit(":", 1)[0]
+    dongle = hass.data.get(DOMAIN, {}).get(DATA_DONGLES, {}).get(address)
+    if dongle is None:
+        return await async_probe(session, host, request_timeout)
+    discovered = await dongle.gate.request(
+        ("probe",), lambda: async_probe(session, host, request_timeout)
+    )
+    if discovered is not None:
+        dongle.set_bus_order(discovered.inverter_ids)
+    return discovered
+
+
+async def _async_scan_hosts(hass: HomeAssistant) -> list[str]:
+    """Return the addresses of the local IPv4 networks of Home Assistant.
+
+    Networks larger than DISCOVERY_MAX_HOSTS are narrowed to the block of
+    that size around Home Assistant's own address.
+    """
+    prefix = 32 - (DISCOVERY_MAX_HOSTS.bit_length() - 1)
+    hosts: dict[str, None] = {}
+    for adapter in await network.async_get_adapters(hass):
+        if not adapter["enabled"]:
+            continue
+        for address in adapter["ipv4"]:
+            own = ipaddress.IPv4Address(address["address"])
+            if own.is_loopback or own.is_link_local:
+                continue
+            subnet = ipaddress.IPv4Network(
+                (own, max(address["network_prefix"], prefix)), strict=False
+            )
+            for host in subnet.hosts():
+                if host != own:
+                    hosts[str(host)] = None
+    return list(hosts)
+
+
+async def async_discover(
+    hass: HomeAssistant,
+    hosts: list[str] | None = None,
+    concurrency: int = DISCOVERY_CONCURRENCY,
+    request_timeout: float = DISCOVERY_TIMEOUT_SECONDS,
+) -> list[DiscoveredDongle]:
+    """Probe hosts, by default the local networks, for dongles.
+
+    At most `concurrency` probes run at once, so a /24 is scanned in a couple
+    of timeouts.
+    """
+    if hosts is None:
+        hosts = await _async_scan_hosts(hass)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(host: str) -> DiscoveredDongle | None:
+        async with semaphore:
+            return await async_probe_host(hass, host, request_timeout)
+
+    _LOGGER.debug("Probing %d hosts for Solplanet dongles", len(hosts))
+    results = await asyncio.gather(*(probe(host) for host in hosts))
+    return [dongle for dongle in results if dongle is not None]
@@ -0,0 +1,227 @@
+"""Dongles and the inverters chained to them on the RS485 bus."""
+from __future__ import annotations
+
+import asyncio
+from asyncio import timeout
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+import logging
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    DATA_DONGLES,
+    DOMAIN,
+    MIN_REQUEST_SPACING_SECONDS,
+    SWEEP_BUDGET_SECONDS,
+)
+
+if TYPE_CHECKING:
+    from .hub import Hub
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+class RequestGate:
+    """Gate every request to one dongle goes through.
+
+    Requests run one at a time with at least `min_spacing` seconds between
+    them, queued writes go before queued reads, and a read that is already
+    queued or running is shared with everyone asking for the same key. A
+    request's timeout starts when it gets its turn, so time spent queued
+    behind a slow request does not count against it, and a request that
+    times out is cancelled and frees the dongle.
+    """
+
+    def __init__(self, min_spacing: float) -> None:
+        """Initialize gate."""
+        self._min_spacing = min_spacing
+        self._busy = False
+        self._last_done = 0.0
+        self._writes: deque[asyncio.Future] = deque()
+        self._reads: deque[asyncio.Future] = deque()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def request(
+        self,
+        key: Hashable,
+        request: Callable[[], Awaitable[_T]],
+        write: bool = False,
+        request_timeout: float | None = None,
+    ) -> _T:
+        """Run request when the dongle is free and return its result.
+
+        Reads with the key of a read that is still pending get its result
+        instead of sending their own. Raises TimeoutError if the request took
+        longer than request_timeout seconds once it was sent.
+        """
+        if not write and (task := self._inflight.get(key)) is not None:
+            return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._run(request, write, request_timeout))
+        if not write:
+            self._inflight[key] = task
+
+        @callback
+        def _done(task: asyncio.Task) -> None:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Retrieve the exception in case every caller gave up waiting.
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(_done)
+        # Shielded so a caller timing out does not cancel the request of the
+        # others sharing it.
+        return await asyncio.shield(task)
+
+    async def _run(
+        self,
+        request: Callable[[], Awaitable[_T]],
+        write: bool,
+        request_timeout: float | None,
+    ) -> _T:
+        """Run request once it is its turn."""
+        await self._acquire(write)
+        try:
+            delay = self._last_done + self._min_spacing - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with timeout(request_timeout):
+                return await request()
+        finally:
+            self._last_done = time.monotonic()
+            self._release()
+
+    async def _acquire(self, write: bool) -> None:
+        """Wait until the dongle is free, writes first."""
+        if not self._busy:
+            self._busy = True
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        (self._writes if write else self._reads).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Pass the turn on if it was handed over just before cancelling.
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Hand the dongle to the next waiting request, writes first."""
+        for waiters in (self._writes, self._reads):
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._busy = False
+
+
+class Dongle:
+    """One dongle and every inverter on its RS485 bus.
+
+    Everything talking to the dongle shares its request gate and, for
+    transports that hold one, its connection. The inverters are polled in a
+    single sweep, one after the other in the order they are listed on the
+    bus, within one budget of SWEEP_BUDGET_SECONDS.
+    """
+
+    def __init__(self, host: str) -> None:
+        """Initialize dongle."""
+        self.host = host
+        self.gate = RequestGate(MIN_REQUEST_SPACING_SECONDS)
+        # Connections shared by the transports of every inverter, by key.
+        self.connections: dict[Hashable, Any] = {}
+        # Serial numbers in the order the dongle lists them, see discovery.py.
+        self.bus_order: list[str] = []
+        self.hubs: dict[str, Hub] = {}
+        # Hubs using the dongle, whether polled or not, see
+        # async_release_dongle.
+        self.users = 0
+        # Inverter the next sweep starts with after one ran out of budget.
+        self._resume: str | None = None
+
+    def add_hub(self, hub: Hub) -> None:
+        """Add the hub of one inverter on the bus to the sweep."""
+        self.hubs[hub.hub_id] = hub
+
+    def remove_hub(self, hub: Hub) -> None:
+        """Remove the hub of one inverter from the sweep."""
+        self.hubs.pop(hub.hub_id, None)
+
+    def set_bus_order(self, inverter_ids: list[str]) -> None:
+        """Poll the inverters in the order the dongle lists them."""
+        self.bus_order = [inverter_id.lower() for inverter_id in inverter_ids]
+
+    def _sweep_order(self) -> list[Hub]:
+        """Return the hubs in bus order, starting where the last sweep stopped."""
+        position = {hub_id: index for index, hub_id in enumerate(self.bus_order)}
+        hubs = sorted(
+            self.hubs.values(),
+            key=lambda hub: position.get(hub.hub_id, len(position)),
+        )
+        for index, hub in enumerate(hubs):
+            if hub.hub_id == self._resume:
+                return hubs[index:] + hubs[:index]
+        return hubs
+
+    async def async_sweep(
+        self, budget: float = SWEEP_BUDGET_SECONDS
+    ) -> dict[str, dict | Exception]:
+        """Poll every inverter that is due and return the results by hub id.
+
+        Inverters not reached within budget seconds are left out and polled
+        first by the next sweep.
+        """
+        deadline = time.monotonic() + budget
+        results: dict[str, dict | Exception] = {}
+        hubs = self._sweep_order()
+        self._resume = None
+        for hub in hubs:
+            if time.monotonic() >= deadline:
+                _LOGGER.debug(
+                    "Sweep of %s out of time, %s polled next", self.host, hub.hub_id
+                )
+                self._resume = hub.hub_id
+                break
+            try:
+                results[hub.hub_id] = await hub.fetch_data()
+            except Exception as err:  # pylint: disable=broad-except
+                # Only fails this inverter, the sweep goes on with the next.
+                results[hub.hub_id] = err
+        return results
+
+
+@callback
+def async_get_dongle(hass: HomeAssistant, host: str) -> Dongle:
+    """Return the dongle at host, shared by everything talking to it.
+
+    Any port in host is ignored, so the HTTP and Modbus transports of one
+    dongle share it.
+    """
+    address = host.rsplit(":", 1)[0]
+    dongles: dict[str, Dongle] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        DATA_DONGLES, {}
+    )
+    if (dongle := dongles.get(address)) is None:
+        dongle = dongles[address] = Dongle(address)
+    return dongle
+
+
+@callback
+def async_release_dongle(hass: HomeAssistant, dongle: Dongle) -> None:
+    """Stop using dongle, and forget it once no hub uses it any more.
+
+    Hubs that only test a connection, e.g. in the config flow, would otherwise
+    leave their dongle behind.
+    """
+    dongle.users -= 1
+    dongles: dict[str, Dongle] = hass.data.get(DOMAIN, {}).get(DATA_DONGLES, {})
+    if dongle.users <= 0 and dongles.get(dongle.host) is dongle:
+        del dongles[dongle.host]
@@ -0,0 +1,76 @@
+"""Energy totals integrated locally from power samples."""
+from __future__ import annotations
+
+from .sensor_descriptions import SENSORS
+
+# (device, energy key, power key) of every energy value that can be integrated.
+INTEGRATED_ENERGY = tuple(
+    (description.device, description.key, description.integral_of)
+    for description in SENSORS
+    if description.integral_of is not None
+)
+
+
+class EnergyIntegrator:
+    """Integrate power samples in kW into energy totals in kWh.
+
+    Consecutive samples are combined with the trapezoidal rule. Intervals
+    longer than `max_gap` seconds (the inverter was offline, or Home Assistant
+    was stopped) are not integrated since the power in between is unknown.
+    Negative power is counted as zero so the totals never decrease.
+    """
+
+    def __init__(self, max_gap: float) -> None:
+        """Initialize integrator."""
+        self._max_gap = max_gap
+        # Energy totals by "device.key".
+        self.totals: dict[str, float] = {}
+        # Last (timestamp, power) sample by "device.key" of the energy value.
+        self._samples: dict[str, tuple[float, float]] = {}
+        # Values last written into the data, to tell them from reported ones.
+        self._written: dict[str, float] = {}
+        # Last value the dongle reported by "device.key", held while a poll
+        # fails so the total never drops to the integrated one and back.
+        self._reported: dict[str, float] = {}
+
+    def update(self, data: dict[str, dict], now: float) -> None:
+        """Integrate the power values of data sampled at `now`.
+
+        Energy values the dongle never reported are filled in from the totals.
+        """
+        for device, energy_key, power_key in INTEGRATED_ENERGY:
+            values = data[device]
+            key = f"{device}.{energy_key}"
+            power = values.get(power_key)
+            if power is not None:
+                power = max(power, 0)
+                last = self._samples.get(key)
+                if last is not None and 0 < now - last[0] <= self._max_gap:
+                    self.totals[key] = (
+                        self.totals.get(key, 0)
+                        + (last[1] + power) / 2 * (now - last[0]) / 3600
+                    )
+                self._samples[key] = (now, power)
+            value = values.get(energy_key)
+            if value is not None and value != self._written.get(key):
+                self._reported[key] = value
+            elif key in self._reported:
+                values[energy_key] = self._reported[key]
+            elif key in self.totals:
+                values[energy_key] = self._written[key] = round(self.totals[key], 3)
+
+    def as_dict(self) -> dict:
+        """Return the state to store."""
+        return {
+            "totals": self.totals,
+            "samples": self._samples,
+            "reported": self._reported,
+        }
+
+    def restore(self, state: dict) -> None:
+        """Restore the state returned by as_dict."""
+        self.totals = dict(state.get("totals", {}))
+        self._reported = dict(state.get("reported", {}))
+        self._samples = {
+            key: tuple(sample) for key, sample in state.get("samples", {}).items()
+        }
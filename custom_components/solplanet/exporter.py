@@ -0,0 +1,284 @@
+"""Batched export of every poll to a time series database."""
+from __future__ import annotations
+
+import asyncio
+from asyncio import timeout
+from collections import deque
+import logging
+from pathlib import Path
+import time
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    EXPORT_BATCH_LINES,
+    EXPORT_FLUSH_SECONDS,
+    EXPORT_QUEUE_LINES,
+    EXPORT_TIMEOUT_SECONDS,
+)
+from .hub import Hub
+
+_LOGGER = logging.getLogger(__name__)
+
+EXPORTERS = ["none", "influxdb", "mqtt", "file"]
+
+MEASUREMENT = "solplanet"
+
+
+class ExportError(Exception):
+    """Error to indicate a batch could not be written."""
+
+
+def _escape_tag(value: str) -> str:
+    """Escape a tag value for the line protocol."""
+    for char in ("\\", ",", " ", "="):
+        value = value.replace(char, f"\\{char}")
+    return value
+
+
+def format_lines(hub_id: str, data: dict[str, dict], timestamp_ns: int) -> list[str]:
+    """Return the numeric values of data as line protocol, one line per device."""
+    lines = []
+    inverter = _escape_tag(hub_id)
+    for device, values in data.items():
+        fields = ",".join(
+            f"{key}={value}"
+            for key, value in values.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        )
+        if fields:
+            lines.append(
+                f"{MEASUREMENT},inverter={inverter},device={device} "
+                f"{fields} {timestamp_ns}"
+            )
+    return lines
+
+
+class Sink:
+    """Destination of the exported batches."""
+
+    async def write(self, lines: list[str]) -> None:
+        """Write a batch of lines.
+
+        Raises ExportError if the batch could not be written.
+        """
+        raise NotImplementedError
+
+
+class InfluxDBSink(Sink):
+    """InfluxDB write endpoint, e.g. .../api/v2/write?org=o&bucket=b."""
+
+    def __init__(
+        self, session: aiohttp.ClientSession, url: str, token: str | None
+    ) -> None:
+        """Initialize sink."""
+        self._session = session
+        self._url = url
+        self._headers = {"Authorization": f"Token {token}"} if token else {}
+
+    async def write(self, lines: list[str]) -> None:
+        """POST the batch as one line protocol body."""
+        try:
+            async with self._session.post(
+                self._url,
+                data="\n".join(lines),
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(total=EXPORT_TIMEOUT_SECONDS),
+            ) as response:
+                response.raise_for_status()
+        except TimeoutError as err:
+            raise ExportError("Timeout writing to InfluxDB") from err
+        except (aiohttp.ClientError, OSError) as err:
+            raise ExportError(err) from err
+
+
+class MqttSink(Sink):
+    """One MQTT message of line protocol per batch, e.g. for Telegraf."""
+
+    def __init__(self, hass: HomeAssistant, topic: str) -> None:
+        """Initialize sink."""
+        self._hass = hass
+        self._topic = topic
+
+    async def write(self, lines: list[str]) -> None:
+        """Publish the batch through Home Assistant's MQTT integration."""
+        # Only loaded when MQTT export is configured.
+        from homeassistant.components import (  # pylint: disable=import-outside-toplevel
+            mqtt,
+        )
+
+        try:
+            await mqtt.async_publish(self._hass, self._topic, "\n".join(lines))
+        except HomeAssistantError as err:
+            raise ExportError(err) from err
+
+
+class FileSink(Sink):
+    """Append the batches to a local file.
+
+    With `max_bytes`, a file that reached that size is moved to <file>.1,
+    replacing the previous one, so the sink takes at most about twice as
+    much disk space.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, path: str, max_bytes: int | None = None
+    ) -> None:
+        """Initialize sink."""
+        self._hass = hass
+        self._path = Path(path)
+        self._max_bytes = max_bytes
+
+    def _append(self, text: str) -> None:
+        if (
+            self._max_bytes is not None
+            and self._path.exists()
+            and self._path.stat().st_size >= self._max_bytes
+        ):
+            self._path.replace(f"{self._path}.1")
+        with self._path.open("a", encoding="utf-8") as file:
+            file.write(text)
+
+    async def write(self, lines: list[str]) -> None:
+        """Append the batch, one line per line."""
+        try:
+            await self._hass.async_add_executor_job(
+                self._append, "".join(f"{line}\n" for line in lines)
+            )
+        except OSError as err:
+            raise ExportError(err) from err
+
+
+def create_sink(hass: HomeAssistant, options: dict) -> Sink:
+    """Return the sink configured in the config entry options."""
+    exporter = options["exporter"]
+    target = options["export_target"]
+    if exporter == "influxdb":
+        return InfluxDBSink(
+            async_get_clientsession(hass), target, options.get("export_token")
+        )
+    if exporter == "mqtt":
+        return MqttSink(hass, target)
+    return FileSink(hass, hass.config.path(target))
+
+
+class TelemetryExporter:
+    """Queue the values of every poll and write them to a sink in batches.
+
+    Values are formatted right in the poll path and queued, and a background
+    task writes a batch once `batch_size` lines are queued or every
+    `flush_interval` seconds. The queue holds at most `queue_size` lines; when
+    the sink cannot keep up the oldest lines are dropped, so polling is never
+    slowed down by the export. Failed batches are put back and retried with
+    the next flush.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        sink: Sink,
+        batch_size: int = EXPORT_BATCH_LINES,
+        flush_interval: float = EXPORT_FLUSH_SECONDS,
+        queue_size: int = EXPORT_QUEUE_LINES,
+    ) -> None:
+        """Initialize exporter."""
+        self._hass = hass
+        self._sink = sink
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: deque[str] = deque(maxlen=queue_size)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @callback
+    def async_start(self) -> None:
+        """Start writing batches in the background."""
+        self._task = self._hass.async_create_background_task(
+            self._async_run(), "solplanet telemetry export"
+        )
+
+    async def async_stop(self) -> None:
+        """Stop the background task and write what is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            # Let a batch being written go back to the queue first.
+            await asyncio.wait([self._task])
+            self._task = None
+        while self._queue and await self._async_flush():
+            pass
+
+    @callback
+    def add(self, hub: Hub) -> None:
+        """Queue the current values of hub."""
+        self.add_lines(format_lines(hub.hub_id, hub.data, time.time_ns()))
+
+    @callback
+    def add_lines(self, lines: list[str]) -> None:
+        """Queue lines as they are."""
+        overflow = len(self._queue) + len(lines) - self._queue.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self._queue.extend(lines)
+        if len(self._queue) >= self._batch_size:
+            self._wakeup.set()
+
+    async def _async_run(self) -> None:
+        """Write a batch whenever one is full or the flush interval passed."""
+        while True:
+            try:
+                async with timeout(self._flush_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._queue:
+                if not await self._async_flush():
+                    break
+                if len(self._queue) < self._batch_size:
+                    break
+
+    async def _async_flush(self) -> bool:
+        """Write one batch, returning False if the sink failed."""
+        batch = [
+            self._queue.popleft()
+            for _ in range(min(self._batch_size, len(self._queue)))
+        ]
+        try:
+            await self._sink.write(batch)
+        except asyncio.CancelledError:
+            self._requeue(batch)
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            # Whatever the sink raised, the export carries on with the next
+            # flush.
+            self.errors += 1
+            if isinstance(err, ExportError):
+                _LOGGER.warning("Error exporting telemetry: %s", err)
+            else:
+                _LOGGER.exception("Unexpected error exporting telemetry")
+            self._requeue(batch)
+            return False
+        self.sent += len(batch)
+        return True
+
+    def _requeue(self, batch: list[str]) -> None:
+        """Put a batch back to be retried, unless newer lines pushed it out."""
+        room = self._queue.maxlen - len(self._queue)
+        self.dropped += len(batch) - room if len(batch) > room else 0
+        self._queue.extendleft(reversed(batch[-room:] if room else []))
+
+    def as_dict(self) -> dict:
+        """Return the exporter's counters."""
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
@@ -2,16 +2,71 @@
 from __future__ import annotations
 
 import asyncio
-from asyncio import timeout
-import contextlib
+from collections.abc import Callable
+import logging
 import random
+import time
+from typing import Any
 
-import requests
+import aiohttp
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN
+from .breaker import OPEN, CircuitBreaker
+from .capabilities import Capabilities
+from .const import (
+    CACHE_SAVE_DELAY_SECONDS,
+    CAPABILITY_MISSED_POLLS,
+    DOMAIN,
+    ENERGY_MAX_GAP_SECONDS,
+    ENERGY_SAVE_DELAY_SECONDS,
+    IDLE_POLL_INTERVAL_SECONDS,
+    SAMPLE_HISTORY_SECONDS,
+    OFFLINE_BACKOFF_SECONDS,
+    OFFLINE_FAILURE_THRESHOLD,
+    POLL_INTERVALS,
+    PUSH_POLL_FALLBACK_SECONDS,
+    REQUEST_TIMEOUT_SECONDS,
+    UPDATE_INTERVAL_SECONDS,
+)
 from .devices import Battery, Inverter, Meter, Solar
+from .dongle import async_get_dongle, async_release_dongle
+from .energy import EnergyIntegrator
+from .metrics import PollMetrics
+from .power_flow import update_power_flow
+from .samples import SampleBuffer
+from .scheduler import EndpointSchedule
+from .sensor_descriptions import (
+    SENSORS,
+    SensorDescription,
+    empty_result,
+    update_from_payload,
+)
+from .transport import ENDPOINTS, HttpTransport, Transport, TransportError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Raw fields whose changes keep an endpoint on its fast poll interval.
+WATCHED_FIELDS = {
+    "inverter": ("pac",),
+    "meter": ("pac",),
+    "battery": ("pb", "soc"),
+}
+
+# Raw field that reads zero when the endpoint has nothing to report, e.g. the
+# inverter output power at night.
+IDLE_FIELDS = {
+    "inverter": "pac",
+}
+
+DEVICE_CLASSES = {
+    "inverter": Inverter,
+    "battery": Battery,
+    "meter": Meter,
+    "solar": Solar,
+}
 
 
 class Hub:
@@ -19,20 +74,107 @@ class Hub:
 
     manufacturer = "Solplanet/AISWEI"
 
-    def __init__(self, hass: HomeAssistant, host: str, inverter_id: str) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        host: str,
+        inverter_id: str,
+        session: aiohttp.ClientSession | None = None,
+        push: bool = False,
+        transport: Transport | None = None,
+        state_interval: float = 0,
+    ) -> None:
         """Init hub."""
         self._host = host
+        # Address pushed data frames must come from, see push.py.
+        self.host_address = host.rsplit(":", 1)[0] if ":" in host else host
+        # What host_address resolved to, and when, if it is a host name.
+        self.resolved_addresses: set[str] = set()
+        self.resolved_at: float | None = None
+        self.push = push
+        # Minimum seconds between state writes of high frequency sensors.
+        self.state_interval = state_interval
         self._inverter_id = inverter_id
         self._hass = hass
+        if transport is None:
+            # HA's shared client session keeps connections to the dongle alive
+            # between polls instead of opening a new socket every second.
+            transport = HttpTransport(
+                session or async_get_clientsession(hass), host, inverter_id
+            )
+        self._transport = transport
+        # The dongle, and its request gate, are shared with every hub, config
+        # flow and service using it.
+        self.dongle = async_get_dongle(hass, host)
+        self.dongle.users += 1
+        self._gate = self.dongle.gate
         self._name = inverter_id
         self._id = inverter_id.lower()
+        # Cleared while the breaker is open; entities use it for availability.
         self.online = True
+        # Set while the values are the cached ones from before a restart.
+        self.stale = False
+        self._breaker = CircuitBreaker(
+            OFFLINE_FAILURE_THRESHOLD, *OFFLINE_BACKOFF_SECONDS
+        )
 
-        self.devices = {}
-        self.devices["inverter"] = Inverter(inverter_id, self._name)
-        self.devices["battery"] = Battery(inverter_id, self._name)
-        self.devices["meter"] = Meter(inverter_id, self._name)
-        self.devices["solar"] = Solar(inverter_id, self._name)
+        self._schedules = {
+            endpoint: EndpointSchedule(
+                *POLL_INTERVALS[endpoint],
+                watch_keys=WATCHED_FIELDS.get(endpoint, ()),
+                idle_key=IDLE_FIELDS.get(endpoint),
+                idle_interval=IDLE_POLL_INTERVAL_SECONDS,
+            )
+            for endpoint in ENDPOINTS
+        }
+        # Last payload of each endpoint, reused while it is not due for a poll.
+        self._raw = dict.fromkeys(ENDPOINTS)
+        # Parsed values, updated in place on every poll rather than rebuilt.
+        self._data = empty_result()
+        self.metrics = PollMetrics(ENDPOINTS)
+        self._integrator = EnergyIntegrator(ENERGY_MAX_GAP_SECONDS)
+        self._energy_store: Store | None = None
+        self._cache_store: Store | None = None
+        # Last payload of each endpoint that answered, kept for a warm start.
+        self._good_raw: dict[str, dict] = {}
+        # Monotonic time each endpoint last answered, by poll or push.
+        self.updated_at: dict[str, float] = {}
+        # Recent full resolution history, see the get_samples service.
+        # One sample per update cycle, also when the endpoints are pushed one
+        # after the other; polls are at least UPDATE_INTERVAL_SECONDS apart.
+        self.samples = SampleBuffer(
+            round(SAMPLE_HISTORY_SECONDS / UPDATE_INTERVAL_SECONDS),
+            UPDATE_INTERVAL_SECONDS / 2,
+        )
+        # Called with every new set of values, see async_add_listener.
+        self._listeners: list[Callable[[], None]] = []
+        # Closed loop power control and telemetry export, set up with the
+        # config entry.
+        self.controller = None
+        self.exporter = None
+        # Coordinator polling the hub, set while it is part of a site.
+        self.coordinator = None
+
+        # What the inverter has, detected once the inverter endpoint answered.
+        # Until then every device, endpoint and sensor is assumed to exist.
+        self.capabilities: Capabilities | None = None
+        # Consecutive failed or non-JSON object answers of the endpoints that
+        # have not answered with data yet. Ruled out at CAPABILITY_MISSED_POLLS,
+        # except the inverter endpoint, which every inverter has.
+        self._misses = dict.fromkeys(ENDPOINTS, 0)
+        # Endpoints whose misses include failures, which are not stored as
+        # absent so they are tried again after a restart.
+        self._failed: set[str] = set()
+        # First payload with data of the endpoints confirmed since the
+        # capabilities were last applied.
+        self._confirmed: dict[str, dict] = {}
+        # Called whenever devices or sensors were ruled out.
+        self._capability_listeners: list[Callable[[], None]] = []
+        self.descriptions: tuple[SensorDescription, ...] = SENSORS
+        self.devices = {
+            device: device_class(inverter_id, self._name)
+            for device, device_class in DEVICE_CLASSES.items()
+        }
 
         self.energy_sum = 0
 
@@ -41,73 +183,345 @@ class Hub:
         """ID for solplanet hub."""
         return self._id
 
-    async def fetch_data(self) -> dict:
-        """Fetch data from the inverter API."""
+    @property
+    def data(self) -> dict:
+        """Values of the last poll by device and key."""
+        return self._data
 
-        def req(url):
-            return requests.get(url, timeout=10)
+    async def async_restore(self) -> None:
+        """Restore the energy totals and the payloads cached before a restart.
 
-        inverter_req = await self._hass.async_add_executor_job(
-            req, "http://192.168.1.101:8080/inverter_test.json"
-        )
-        battery_req = await self._hass.async_add_executor_job(
-            req, "http://192.168.1.101:8080/battery_test.json"
+        With cached payloads the values and capabilities are restored and
+        marked stale until the next successful poll.
+        """
+        self._energy_store = Store(self._hass, 1, f"{DOMAIN}.{self._id}.energy")
+        if (state := await self._energy_store.async_load()) is not None:
+            self._integrator.restore(state)
+
+        self._cache_store = Store(self._hass, 1, f"{DOMAIN}.{self._id}.cache")
+        if (cache := await self._cache_store.async_load()) is None:
+            return
+        for endpoint, payload in cache["raw"].items():
+            if endpoint in self._raw:
+                self._raw[endpoint] = self._good_raw[endpoint] = payload
+                update_from_payload(self._data, endpoint, payload)
+        if cache["capabilities"] is not None:
+            capabilities = Capabilities.from_dict(cache["capabilities"])
+            self._misses = dict.fromkeys(capabilities.pending, 0)
+            self._apply_capabilities(capabilities)
+        self.stale = True
+
+    def _cache(self) -> dict:
+        """Return the last payloads and capabilities for the cache store.
+
+        Endpoints ruled out after failures are stored as pending.
+        """
+        capabilities = self.capabilities and Capabilities(
+            self.capabilities.endpoints, self.capabilities.pending | self._failed
         )
-        with contextlib.suppress(Exception):
-            inverter_info = inverter_req.json()
-            battery_info = battery_req.json()
-
-        # TODO: add json validation
-        result = {}
-
-        result["battery"] = {
-            "energy_in_total": battery_info["ebi"] / 10,
-            "energy_out_total": battery_info["ebo"] / 10,
-            "current": battery_info["cb"],
-            "voltage": battery_info["vb"],
-            "power": battery_info["pb"],
-            "mode": "charging",
-            "state_of_charge": battery_info["soc"],
+        return {
+            "raw": self._good_raw,
+            "capabilities": capabilities and capabilities.as_dict(),
         }
 
-        result["inverter"] = {
-            "power_in_solar": 10,
-            "power_in_battery": 100,
-            "power_in_total": 100,
-            "energy_in_solar": 10,
-            "energy_in_battery": 100,
-            "energy_in_total": 100,
-        }
+    async def async_close(self) -> None:
+        """Close the connection to the dongle and save the stores."""
+        await self._transport.close()
+        async_release_dongle(self._hass, self.dongle)
+        if self._energy_store is not None:
+            await self._energy_store.async_save(self._integrator.as_dict())
+        if self._cache_store is not None and not self.stale:
+            await self._cache_store.async_save(self._cache())
 
-        result["meter"] = {
-            "voltage_1": inverter_info["vac"][0],
-            "voltage_2": inverter_info["vac"][1],
-            "voltage_3": inverter_info["vac"][2],
-            "current_1": inverter_info["iac"][0],
-            "current_2": inverter_info["iac"][1],
-            "current_3": inverter_info["iac"][2],
-            "export_power": 10,
-            "import_power": 10,
-            "export_energy": 10,
-            "import_energy": 10,
-        }
+    def _process_values(self) -> None:
+        """Derive, integrate and record the values of the latest poll or push."""
+        now = time.time()
+        battery = self._raw.get("battery")
+        update_power_flow(
+            self._data,
+            isinstance(battery, dict)
+            and isinstance(battery.get("ppv"), (int, float)),
+        )
+        self._integrator.update(self._data, now)
+        self.samples.append(now, self._data)
+        if self._energy_store is not None:
+            self._energy_store.async_delay_save(
+                self._integrator.as_dict, ENERGY_SAVE_DELAY_SECONDS
+            )
+        if self._cache_store is not None:
+            self._cache_store.async_delay_save(self._cache, CACHE_SAVE_DELAY_SECONDS)
+        for listener in self._listeners:
+            listener()
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener with every new set of values, before the entities.
+
+        Returns a function removing the listener.
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    @callback
+    def async_add_capabilities_listener(
+        self, listener: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Call listener whenever devices or sensors were ruled out.
+
+        Returns a function removing the listener.
+        """
+        self._capability_listeners.append(listener)
+        return lambda: self._capability_listeners.remove(listener)
+
+    def set_fast_poll(self, endpoint: str, fast: bool) -> None:
+        """Keep polling endpoint at its fastest rate, or let it adapt again."""
+        if (schedule := self._schedules.get(endpoint)) is None:
+            return
+        schedule.max_interval = (
+            schedule.min_interval if fast else POLL_INTERVALS[endpoint][1]
+        )
+        schedule.interval = schedule.min_interval
+        if not fast:
+            return
+        # Poll it right away rather than once the wait the coordinator already
+        # scheduled from the old interval is over.
+        schedule.next_poll = time.monotonic()
+        if self.coordinator is not None:
+            self._hass.async_create_background_task(
+                self.coordinator.async_request_refresh(),
+                f"{DOMAIN} fast poll {self._id}",
+            )
+
+    @property
+    def writable(self) -> bool:
+        """Return True if settings can be written, i.e. a setting map is set."""
+        return self._transport.writable
+
+    @property
+    def settings(self) -> tuple[str, ...]:
+        """Return the settings the setting map has."""
+        return tuple(self._transport.settings or ())
 
-        result["solar"] = {
-            "power_total": 10,
-            "power_1": 10,
-            "power_2": 10,
-            "energy_total": 10,
-            "energy_1": 10,
-            "energy_2": 10,
-            "voltage_1": 10,
-            "voltage_2": 10,
-            "current_1": 10,
-            "current_2": 10,
+    async def async_read_setting(self, setting: str) -> int:
+        """Return the value of a setting in effect on the inverter.
+
+        Falls back to the setting map's default if the transport cannot read
+        it. Raises TransportError or TimeoutError if there is neither.
+        """
+        try:
+            return await self._gate.request(
+                ("setting", self._inverter_id, setting),
+                lambda: self._transport.read_setting(setting),
+                request_timeout=REQUEST_TIMEOUT_SECONDS,
+            )
+        except (TransportError, TimeoutError):
+            spec = (self._transport.settings or {}).get(setting, {})
+            if "default" not in spec:
+                raise
+            return spec["default"]
+
+    async def async_write(self, setting: str, value: int) -> None:
+        """Write a setting to the inverter, ahead of any queued reads.
+
+        Raises TransportError or TimeoutError if the write failed.
+        """
+        await self._gate.request(
+            ("write", self._inverter_id, setting),
+            lambda: self._transport.write(setting, value),
+            write=True,
+            request_timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+
+    async def _fetch(
+        self, endpoint: str, on_send: Callable[[], None] | None = None
+    ) -> tuple[dict[str, Any], int]:
+        """Read endpoint through the dongle's request gate.
+
+        on_send is called when the request gets its turn, unless it shares a
+        pending read.
+        """
+
+        async def send() -> tuple[dict[str, Any], int]:
+            if on_send is not None:
+                on_send()
+            return await self._transport.fetch(endpoint)
+
+        return await self._gate.request(
+            ("fetch", self._inverter_id, endpoint),
+            send,
+            request_timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+
+    async def _fetch_endpoint(self, endpoint: str) -> dict | None:
+        """Fetch a single endpoint, returning None if it failed or timed out."""
+        metrics = self.metrics.endpoints[endpoint]
+        queued = sent = time.monotonic()
+
+        def on_send() -> None:
+            nonlocal sent
+            sent = time.monotonic()
+            metrics.record_queue_wait(sent - queued)
+
+        try:
+            payload, size = await self._fetch(endpoint, on_send)
+        except TimeoutError:
+            metrics.record_timeout(time.monotonic() - sent)
+            _LOGGER.debug("Timeout fetching %s from %s", endpoint, self._host)
+        except TransportError as err:
+            metrics.record(time.monotonic() - sent)
+            _LOGGER.debug("Error fetching %s from %s: %s", endpoint, self._host, err)
+        else:
+            metrics.record(time.monotonic() - sent, size)
+            return payload
+        return None
+
+    def _apply_capabilities(self, capabilities: Capabilities) -> None:
+        """Only keep the devices, sensors and endpoints the inverter has."""
+        self.capabilities = capabilities
+        self.descriptions = tuple(
+            description
+            for description in SENSORS
+            if capabilities.supports(description)
+        )
+        devices = {"inverter"}.union(
+            description.device for description in self.descriptions
+        )
+        self.devices = {
+            device: device_info
+            for device, device_info in self.devices.items()
+            if device in devices
         }
+        # Endpoints that were ruled out are no longer polled.
+        for endpoint in list(self._schedules):
+            if not capabilities.has_endpoint(endpoint):
+                del self._schedules[endpoint]
+        _LOGGER.debug(
+            "Inverter %s has %s, %d PV strings",
+            self._name,
+            ", ".join(self.devices),
+            capabilities.mppt_count,
+        )
+        for listener in self._capability_listeners:
+            listener()
+
+    def _detect_capabilities(self, results: list[tuple[str, dict | None]]) -> None:
+        """Confirm or rule out pending endpoints from the answers of a poll.
+
+        An endpoint is present once it answered with data, and absent after
+        CAPABILITY_MISSED_POLLS failed or non-JSON object answers in a row.
+        Empty answers, e.g. of the inverter at night, leave it pending.
+        """
+        changed = False
+        for endpoint, payload in results:
+            if endpoint not in self._misses:
+                continue
+            if isinstance(payload, dict):
+                if payload:
+                    del self._misses[endpoint]
+                    self._failed.discard(endpoint)
+                    self._confirmed[endpoint] = payload
+                    changed = True
+                else:
+                    self._misses[endpoint] = 0
+                continue
+            self._misses[endpoint] += 1
+            if payload is None:
+                self._failed.add(endpoint)
+            if (
+                endpoint != "inverter"
+                and self._misses[endpoint] >= CAPABILITY_MISSED_POLLS
+            ):
+                del self._misses[endpoint]
+                changed = True
+        if "inverter" in self._misses or not (
+            changed or self.capabilities is None
+        ):
+            return
+        endpoints = dict(self.capabilities.endpoints) if self.capabilities else {}
+        endpoints.update(Capabilities.from_payloads(self._confirmed).endpoints)
+        self._confirmed = {}
+        self._apply_capabilities(Capabilities(endpoints, set(self._misses)))
+
+    def seconds_until_next_poll(self) -> float:
+        """Return the time until the next endpoint is due for a poll."""
+        if self._breaker.state == OPEN:
+            next_poll = self._breaker.retry_at
+        else:
+            next_poll = min(
+                schedule.next_poll for schedule in self._schedules.values()
+            )
+        return max(next_poll - time.monotonic(), 0)
+
+    async def fetch_data(self) -> dict:
+        """Fetch data from the inverter API."""
+        now = time.monotonic()
+        if not self._breaker.allow_request(now):
+            raise ConnectionError(f"Inverter at {self._host} is offline")
+
+        due = [
+            endpoint
+            for endpoint, schedule in self._schedules.items()
+            if schedule.is_due(now)
+        ]
+
+        # Queue every due endpoint at once; the request gate sends them to the
+        # dongle one after the other.
+        payloads = await asyncio.gather(
+            *(self._fetch_endpoint(endpoint) for endpoint in due)
+        )
+        # Only answers count for the breaker, so a half open breaker does not
+        # close on a poll that had nothing due. Empty answers still do.
+        answered = any(isinstance(payload, dict) for payload in payloads)
+        if due and not answered:
+            self._breaker.record_failure(now)
+            if self._breaker.state == OPEN and self.online:
+                _LOGGER.info("Inverter at %s is offline", self._host)
+                self.online = False
+            raise ConnectionError(f"No response from inverter at {self._host}")
+        if answered:
+            if not self.online:
+                _LOGGER.info("Inverter at %s is back online", self._host)
+                self.online = True
+            self._breaker.record_success()
+            self.stale = False
+        for endpoint, payload in zip(due, payloads):
+            self._schedules[endpoint].record(now, payload)
+            self._raw[endpoint] = payload
+            if isinstance(payload, dict):
+                self._good_raw[endpoint] = payload
+                self.updated_at[endpoint] = now
+            update_from_payload(self._data, endpoint, payload)
+        self._detect_capabilities(list(zip(due, payloads)))
+        if due:
+            self._process_values()
 
-        return result
+        self.metrics.record_poll(time.monotonic() - now)
+        self.metrics.update_values(self._data["inverter"])
+        return self._data
+
+    def ingest(self, endpoint: str, payload: dict) -> None:
+        """Update the values from a payload pushed by the dongle.
+
+        Each push postpones the poll of its endpoint, so polling only resumes
+        if the dongle stops pushing.
+        """
+        if endpoint not in self._schedules:
+            return
+        now = time.monotonic()
+        self._schedules[endpoint].next_poll = now + PUSH_POLL_FALLBACK_SECONDS
+        self._raw[endpoint] = self._good_raw[endpoint] = payload
+        self.updated_at[endpoint] = now
+        update_from_payload(self._data, endpoint, payload)
+        self._process_values()
+        self._breaker.record_success()
+        self.online = True
+        self.stale = False
 
     async def test_connection(self) -> bool:
-        """Test connectivity to inverter is OK."""
-        await asyncio.sleep(1)
-        return True
+        """Test the inverter endpoint can be read."""
+        try:
+            payload, _ = await self._fetch("inverter")
+        except (TransportError, TimeoutError) as err:
+            _LOGGER.debug("Connection test to %s failed: %s", self.host_address, err)
+            return False
+        return isinstance(payload, dict) and bool(payload)
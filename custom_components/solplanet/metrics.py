@@ -0,0 +1,105 @@
+"""Poll instrumentation for the hub."""
+from __future__ import annotations
+
+from bisect import bisect_left
+
+# Upper bounds in milliseconds of the request latency histogram buckets. The
+# last bucket counts everything slower.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class EndpointMetrics:
+    """Request statistics for one dongle endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize metrics."""
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_received = 0
+        self.last_latency_ms: float | None = None
+        # Time requests spent queued for the dongle, not part of the latency.
+        self.last_queue_wait_ms: float | None = None
+        self.max_queue_wait_ms: float = 0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, latency: float, size: int | None = None) -> None:
+        """Record a request that took `latency` seconds.
+
+        `size` is the number of bytes received, or None if the request failed.
+        """
+        latency_ms = round(latency * 1000, 1)
+        self.requests += 1
+        self.last_latency_ms = latency_ms
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        if size is None:
+            self.errors += 1
+        else:
+            self.bytes_received += size
+
+    def record_queue_wait(self, wait: float) -> None:
+        """Record a request that waited `wait` seconds for its turn."""
+        self.last_queue_wait_ms = round(wait * 1000, 1)
+        self.max_queue_wait_ms = max(self.max_queue_wait_ms, self.last_queue_wait_ms)
+
+    def record_timeout(self, latency: float) -> None:
+        """Record a request that timed out after `latency` seconds."""
+        self.record(latency)
+        self.timeouts += 1
+
+    def as_dict(self) -> dict:
+        """Return the metrics for diagnostics."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes_received": self.bytes_received,
+            "last_latency_ms": self.last_latency_ms,
+            "last_queue_wait_ms": self.last_queue_wait_ms,
+            "max_queue_wait_ms": self.max_queue_wait_ms,
+            "latency_histogram_ms": {
+                f"<={bound}": count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.latency_histogram)
+            }
+            | {f">{LATENCY_BUCKETS_MS[-1]}": self.latency_histogram[-1]},
+        }
+
+
+class PollMetrics:
+    """Statistics of the polls of one hub."""
+
+    def __init__(self, endpoints) -> None:
+        """Initialize metrics."""
+        self.endpoints = {endpoint: EndpointMetrics() for endpoint in endpoints}
+        self.polls = 0
+        self.last_poll_ms: float | None = None
+        # How late the coordinator started the last update, in milliseconds.
+        self.cycle_overrun_ms: float = 0
+
+    def record_poll(self, duration: float) -> None:
+        """Record a poll that took `duration` seconds."""
+        self.polls += 1
+        self.last_poll_ms = round(duration * 1000, 1)
+
+    def update_values(self, values: dict) -> None:
+        """Write the sensor values of the metrics into values."""
+        endpoints = self.endpoints.values()
+        values["poll_duration"] = self.last_poll_ms
+        values["cycle_overrun"] = self.cycle_overrun_ms
+        values["request_errors"] = sum(metrics.errors for metrics in endpoints)
+        values["request_timeouts"] = sum(metrics.timeouts for metrics in endpoints)
+        values["bytes_received"] = sum(metrics.bytes_received for metrics in endpoints)
+        for endpoint, metrics in self.endpoints.items():
+            values[f"latency_{endpoint}"] = metrics.last_latency_ms
+
+    def as_dict(self) -> dict:
+        """Return the metrics for diagnostics."""
+        return {
+            "polls": self.polls,
+            "last_poll_ms": self.last_poll_ms,
+            "cycle_overrun_ms": self.cycle_overrun_ms,
+            "endpoints": {
+                endpoint: metrics.as_dict()
+                for endpoint, metrics in self.endpoints.items()
+            },
+        }
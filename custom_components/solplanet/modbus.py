@@ -0,0 +1,259 @@
+"""Modbus TCP/RTU transport with batched register reads."""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import Any
+
+from pymodbus.client import AsyncModbusSerialClient, AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+from .transport import Transport, TransportError
+
+DEFAULT_MODBUS_PORT = 502
+SERIAL_BAUDRATE = 9600
+
+# Modbus allows at most 125 registers per read.
+MAX_BLOCK_REGISTERS = 125
+# Unused registers that may be read to join two blocks into one request.
+MAX_BLOCK_GAP = 16
+
+# Keyword of the unit address in the client requests, which pymodbus 3.10
+# renamed from slave to device_id.
+UNIT_KEYWORD = (
+    "device_id"
+    if "device_id"
+    in inspect.signature(AsyncModbusTcpClient.read_input_registers).parameters
+    else "slave"
+)
+
+
+class Register:
+    """Input or holding register(s) holding one getdevdata field or setting.
+
+    `index` places the value in a list field (e.g. "vac"), `count` is 1 for
+    16 bit and 2 for 32 bit (high word first) values.
+    """
+
+    __slots__ = ("endpoint", "field", "address", "count", "signed", "index")
+
+    def __init__(
+        self,
+        endpoint: str,
+        field: str,
+        address: int,
+        count: int = 1,
+        signed: bool = False,
+        index: int | None = None,
+    ) -> None:
+        """Initialize register."""
+        self.endpoint = endpoint
+        self.field = field
+        self.address = address
+        self.count = count
+        self.signed = signed
+        self.index = index
+
+
+R = Register
+
+
+def registers_from_map(register_map: dict[str, dict]) -> tuple[Register, ...]:
+    """Return the registers of a map read by transport.load_register_map."""
+    return tuple(
+        R(
+            endpoint,
+            field,
+            spec["address"],
+            spec.get("count", 1),
+            spec.get("signed", False),
+            index,
+        )
+        for endpoint, fields in register_map.items()
+        for field, specs in fields.items()
+        for index, spec in (
+            enumerate(specs) if isinstance(specs, list) else [(None, specs)]
+        )
+    )
+
+
+def plan_blocks(
+    registers: tuple[Register, ...] | list[Register],
+) -> list[tuple[int, int, tuple[Register, ...]]]:
+    """Group registers into as few contiguous reads as possible.
+
+    Returns (start address, register count, registers) for every read.
+    """
+    blocks: list[tuple[int, int, tuple[Register, ...]]] = []
+    start = end = 0
+    members: list[Register] = []
+    for register in sorted(registers, key=lambda register: register.address):
+        register_end = register.address + register.count
+        if members and (
+            register.address - end > MAX_BLOCK_GAP
+            or register_end - start > MAX_BLOCK_REGISTERS
+        ):
+            blocks.append((start, end - start, tuple(members)))
+            members = []
+        if not members:
+            start = register.address
+            end = register_end
+        end = max(end, register_end)
+        members.append(register)
+    if members:
+        blocks.append((start, end - start, tuple(members)))
+    return blocks
+
+
+def decode_block(
+    payload: dict[str, Any], start: int, values: list[int], registers
+) -> None:
+    """Write the fields of registers read from `start` into payload."""
+    for register in registers:
+        offset = register.address - start
+        value = values[offset]
+        if register.count == 2:
+            value = value << 16 | values[offset + 1]
+        bits = 16 * register.count
+        if register.signed and value >= 1 << (bits - 1):
+            value -= 1 << bits
+        if register.index is None:
+            payload[register.field] = value
+        else:
+            field = payload.setdefault(register.field, [])
+            field.extend([0] * (register.index + 1 - len(field)))
+            field[register.index] = value
+
+
+def encode_value(register: Register, value: int) -> list[int]:
+    """Return the register values holding value, high word first."""
+    value = int(value) & ((1 << 16 * register.count) - 1)
+    if register.count == 2:
+        return [value >> 16, value & 0xFFFF]
+    return [value]
+
+
+class ModbusConnection:
+    """One Modbus TCP, or RTU on the serial port given as host, connection.
+
+    Shared by the transports of every unit on the same bus, which handles one
+    request at a time. Closed when the last transport using it is closed.
+    """
+
+    def __init__(self, host: str, framing: str = "tcp") -> None:
+        """Initialize connection."""
+        if framing == "rtu":
+            self.client = AsyncModbusSerialClient(host, baudrate=SERIAL_BAUDRATE)
+        else:
+            address, _, port = host.partition(":")
+            self.client = AsyncModbusTcpClient(
+                address, port=int(port or DEFAULT_MODBUS_PORT)
+            )
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+    async def connect(self) -> None:
+        """Connect unless connected, with the lock held."""
+        if not self.client.connected and not await self.client.connect():
+            raise TransportError("Unable to connect to Modbus device")
+
+    def release(self) -> None:
+        """Close the connection once no transport uses it any more."""
+        self.users -= 1
+        if self.users <= 0:
+            self.client.close()
+
+
+class ModbusTransport(Transport):
+    """Registers of one unit on a Modbus connection."""
+
+    def __init__(
+        self,
+        connection: ModbusConnection,
+        unit: int,
+        register_map: dict[str, dict],
+        settings: dict[str, dict] | None = None,
+    ) -> None:
+        """Initialize transport."""
+        self._connection = connection
+        self.settings = settings
+        # Holding registers of the settings in the setting map.
+        self._setting_registers = {
+            setting: R(
+                "setting",
+                setting,
+                spec["address"],
+                spec.get("count", 1),
+                spec.get("signed", False),
+            )
+            for setting, spec in (settings or {}).items()
+        }
+        connection.users += 1
+        self._client = connection.client
+        self._unit = {UNIT_KEYWORD: unit}
+        registers = registers_from_map(register_map)
+        self._blocks = {
+            endpoint: plan_blocks(
+                [register for register in registers if register.endpoint == endpoint]
+            )
+            for endpoint in register_map
+        }
+
+    async def fetch(self, endpoint: str) -> tuple[dict[str, Any], int]:
+        """Return the payload of endpoint and the number of bytes received."""
+        payload: dict[str, Any] = {}
+        size = 0
+        async with self._connection.lock:
+            await self._connection.connect()
+            for start, count, registers in self._blocks.get(endpoint, ()):
+                try:
+                    response = await self._client.read_input_registers(
+                        start, count=count, **self._unit
+                    )
+                except ModbusException as err:
+                    raise TransportError(err) from err
+                if response.isError():
+                    raise TransportError(str(response))
+                decode_block(payload, start, response.registers, registers)
+                size += 2 * count
+        return payload, size
+
+    def _setting_register(self, setting: str) -> Register:
+        if (register := self._setting_registers.get(setting)) is None:
+            raise TransportError(f"No {setting} in the setting map")
+        return register
+
+    async def write(self, setting: str, value: int) -> None:
+        """Write one of SETTINGS to its holding registers."""
+        register = self._setting_register(setting)
+        async with self._connection.lock:
+            await self._connection.connect()
+            try:
+                response = await self._client.write_registers(
+                    register.address, encode_value(register, value), **self._unit
+                )
+            except ModbusException as err:
+                raise TransportError(err) from err
+            if response.isError():
+                raise TransportError(str(response))
+
+    async def read_setting(self, setting: str) -> int:
+        """Return the value of one of SETTINGS from its holding registers."""
+        register = self._setting_register(setting)
+        payload: dict[str, Any] = {}
+        async with self._connection.lock:
+            await self._connection.connect()
+            try:
+                response = await self._client.read_holding_registers(
+                    register.address, count=register.count, **self._unit
+                )
+            except ModbusException as err:
+                raise TransportError(err) from err
+            if response.isError():
+                raise TransportError(str(response))
+        decode_block(payload, register.address, response.registers, (register,))
+        return payload[setting]
+
+    async def close(self) -> None:
+        """Stop using the Modbus connection."""
+        self._connection.release()
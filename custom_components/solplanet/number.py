@@ -0,0 +1,64 @@
+"""Platform for the limits of the power controller."""
+from __future__ import annotations
+
+from homeassistant.components.number import (
+    NumberDeviceClass,
+    NumberMode,
+    RestoreNumber,
+)
+from homeassistant.const import EntityCategory, UnitOfPower
+
+from .const import DOMAIN
+from .hub import Hub
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    """Add the control limits of the config entry's inverter."""
+    hub = hass.data[DOMAIN][config_entry.entry_id]
+    if not hub.writable:
+        return
+    entities = [LimitNumber(hub, "Export limit", "export_limit")]
+    # Peak shaving discharges the battery.
+    if "battery" in hub.devices:
+        entities.append(LimitNumber(hub, "Import limit", "import_limit"))
+    async_add_entities(entities)
+
+
+class LimitNumber(RestoreNumber):
+    """Grid power limit the power controller holds while it is switched on."""
+
+    _attr_device_class = NumberDeviceClass.POWER
+    _attr_entity_category = EntityCategory.CONFIG
+    _attr_mode = NumberMode.BOX
+    _attr_native_min_value = 0
+    _attr_native_step = 0.1
+    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _attr_should_poll = False
+
+    def __init__(self, hub: Hub, name: str, limit: str) -> None:
+        """Initialize limit."""
+        device = hub.devices["inverter"]
+        self._attr_unique_id = f"{hub.hub_id}_inverter_{name.lower()}"
+        self._attr_name = f"{device.name} {name}"
+        self._attr_device_info = device.device_info
+        self._controller = hub.controller
+        self._attr_native_max_value = hub.controller.rated_power / 1000
+        self._limit = limit
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the limit."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_number_data()
+        if last is not None and last.native_value is not None:
+            setattr(self._controller, self._limit, last.native_value * 1000)
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the limit in kW, None if it was never set."""
+        value = getattr(self._controller, self._limit)
+        return None if value is None else value / 1000
+
+    async def async_set_native_value(self, value: float) -> None:
+        """Set the limit."""
+        setattr(self._controller, self._limit, value * 1000)
+        self.async_write_ha_state()
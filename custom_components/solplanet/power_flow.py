@@ -0,0 +1,98 @@
+"""Power flows between solar, battery, grid and house, derived from readings."""
+from __future__ import annotations
+
+# Flows that belong to the meter device; the others to the inverter.
+METER_FLOWS = ("export_power", "import_power", "consumed_power")
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
+
+
+def power_flow(
+    solar: float | None,
+    battery: float | None,
+    grid: float | None,
+    inverter_out: float | None,
+) -> dict[str, float | None]:
+    """Return the power flows in kW of one installation.
+
+    `solar` is the PV power, `battery` the battery power (positive when
+    discharging), `grid` the meter power (positive when importing) and
+    `inverter_out` the inverter's AC output. Exports are taken to come from
+    solar first, and the battery to discharge into the house.
+    """
+    discharge = charge = None
+    if battery is not None:
+        discharge = max(battery, 0)
+        charge = max(-battery, 0)
+
+    export = grid_import = load = None
+    if grid is not None:
+        export = max(-grid, 0)
+        grid_import = max(grid, 0)
+        if inverter_out is not None:
+            load = max(inverter_out + grid, 0)
+        elif solar is not None:
+            load = max(solar + (battery or 0) + grid, 0)
+
+    solar_to_battery = battery_to_load = solar_to_load = self_consumption = None
+    if solar is not None and charge is not None:
+        solar_to_battery = min(charge, solar)
+    if discharge is not None:
+        battery_to_load = discharge if load is None else min(discharge, load)
+    if solar is not None and load is not None:
+        solar_to_load = max(
+            min(solar - (solar_to_battery or 0), load - (battery_to_load or 0)), 0
+        )
+    if solar and export is not None:
+        self_consumption = round(max(1 - export / solar, 0) * 100, 1)
+
+    return {
+        "export_power": _round(export),
+        "import_power": _round(grid_import),
+        "consumed_power": _round(load),
+        "power_in_solar": _round(solar),
+        "power_in_battery": _round(discharge),
+        "power_in_total": (
+            None if solar is None else _round(solar + (discharge or 0))
+        ),
+        "self_consumption": self_consumption,
+        "solar_to_load": _round(solar_to_load),
+        "solar_to_battery": _round(solar_to_battery),
+        "battery_to_load": _round(battery_to_load),
+    }
+
+
+def update_power_flow(data: dict[str, dict], pv_reported: bool = True) -> None:
+    """Compute the derived power values of one inverter in place.
+
+    Runs once per poll on the values parsed from the raw payloads. Unless
+    `pv_reported`, i.e. the dongle reported the total PV power, it is the sum
+    of the strings, recomputed every time.
+    """
+    solar = data["solar"]
+    for string in ("1", "2"):
+        voltage = solar.get(f"voltage_{string}")
+        current = solar.get(f"current_{string}")
+        solar[f"power_{string}"] = (
+            None
+            if voltage is None or current is None
+            else round(voltage * current / 1000, 3)
+        )
+    if not pv_reported:
+        solar["power_total"] = (
+            None
+            if solar["power_1"] is None
+            else round(solar["power_1"] + (solar["power_2"] or 0), 3)
+        )
+    solar_power = solar.get("power_total")
+
+    flows = power_flow(
+        solar_power,
+        data["battery"].get("power"),
+        data["meter"].get("grid_power"),
+        data["inverter"].get("power_out"),
+    )
+    for key, value in flows.items():
+        data["meter" if key in METER_FLOWS else "inverter"][key] = value
@@ -0,0 +1,208 @@
+"""On-demand profiling of the integration's poll and update path."""
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable
+import cProfile
+import functools
+from pathlib import Path
+import pstats
+import time
+from typing import Any
+
+from . import hub, transport
+from .hub import Hub
+from .sensor_definitions import Coordinator, Sensor
+from .site import Site
+
+# Functions listed in the summary, by their own time.
+TOP_FUNCTIONS = 20
+
+
+class StageStats:
+    """Number and duration of the calls of one stage."""
+
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize stats."""
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        """Count one call that took duration seconds."""
+        self.calls += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def as_dict(self) -> dict:
+        """Return the stats in ms."""
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.calls * 1000, 4) if self.calls else 0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PollProfiler:
+    """Time the stages of every poll and the entity updates while started.
+
+    Starting wraps the functions of the poll and update path, looked up at
+    call time, so nothing is measured, or slowed down, while not profiling.
+    The stages are:
+
+    - cycle: a coordinator update, from the first request to the last value
+    - fetch: the poll of one inverter, including the waits for the dongle
+    - decode: decoding a JSON response
+    - parse: reading the values of one payload
+    - process: deriving, integrating and recording the values of one poll
+    - totals: summing the site totals
+    - entities: notifying every entity of a coordinator update
+
+    and by entity class the `available` and `state` lookups and the state
+    writes. cProfile only runs inside the synchronous stages and entity
+    updates, not while a poll waits for the dongle, so it only records this
+    integration and the state writes it causes.
+    """
+
+    def __init__(self) -> None:
+        """Initialize profiler."""
+        self.stages: dict[str, StageStats] = defaultdict(StageStats)
+        self.entities: dict[str, dict[str, StageStats]] = defaultdict(
+            lambda: defaultdict(StageStats)
+        )
+        self.profile = cProfile.Profile()
+        self._depth = 0
+        self._started = 0.0
+        self._duration = 0.0
+        # (owner, attribute, original) of every wrapped function.
+        self._patches: list[tuple[Any, str, Any]] = []
+
+    def _patch(self, owner: Any, name: str, wrap: Callable[[Any], Any]) -> None:
+        """Replace an attribute of a class or module by its wrapped version."""
+        original = owner.__dict__.get(name)
+        self._patches.append((owner, name, original))
+        setattr(owner, name, wrap(getattr(owner, name)))
+
+    def _timed(self, stat: Callable[..., StageStats]) -> Callable:
+        """Return a wrapper timing an async function into stat(*args)."""
+
+        def wrap(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    stat(*args).add(time.perf_counter() - start)
+
+            return wrapper
+
+        return wrap
+
+    def _profiled(self, stat: Callable[..., StageStats]) -> Callable:
+        """Return a wrapper timing and profiling a function into stat(*args)."""
+
+        def wrap(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self._depth:
+                    self.profile.enable()
+                self._depth += 1
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    stat(*args).add(time.perf_counter() - start)
+                    self._depth -= 1
+                    if not self._depth:
+                        self.profile.disable()
+
+            return wrapper
+
+        return wrap
+
+    def _profiled_property(self, stat: Callable[..., StageStats]) -> Callable:
+        """Return a wrapper timing and profiling the getter of a property."""
+        return lambda prop: property(self._profiled(stat)(prop.fget))
+
+    def _entity_stat(self, kind: str) -> Callable[..., StageStats]:
+        return lambda entity, *args: self.entities[type(entity).__name__][kind]
+
+    def _stage(self, name: str) -> Callable[..., StageStats]:
+        return lambda *args: self.stages[name]
+
+    def start(self) -> None:
+        """Start profiling.
+
+        Raises ValueError if another profiler, e.g. Home Assistant's, is
+        running.
+        """
+        # Fail here rather than inside a poll.
+        self.profile.enable()
+        self.profile.disable()
+        self._started = time.monotonic()
+        for owner, name, stage in (
+            (Coordinator, "_async_update_data", "cycle"),
+            (Hub, "fetch_data", "fetch"),
+        ):
+            self._patch(owner, name, self._timed(self._stage(stage)))
+        for owner, name, stage in (
+            (transport, "json_loads", "decode"),
+            (hub, "update_from_payload", "parse"),
+            (Hub, "_process_values", "process"),
+            (Site, "_update_totals", "totals"),
+            (Coordinator, "async_update_listeners", "entities"),
+        ):
+            self._patch(owner, name, self._profiled(self._stage(stage)))
+        for name in ("available", "state"):
+            self._patch(Sensor, name, self._profiled_property(self._entity_stat(name)))
+        self._patch(
+            Sensor, "async_write_ha_state", self._profiled(self._entity_stat("write"))
+        )
+
+    def stop(self) -> None:
+        """Stop profiling and restore the wrapped functions."""
+        while self._patches:
+            owner, name, original = self._patches.pop()
+            if original is None:
+                # Inherited, e.g. Entity.async_write_ha_state.
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self._duration = time.monotonic() - self._started
+
+    def dump(self, path: str) -> None:
+        """Write the cProfile stats to path, e.g. for snakeviz.
+
+        Does blocking I/O.
+        """
+        self.profile.dump_stats(path)
+
+    def summary(self) -> dict:
+        """Return the time spent per stage, per entity class and function."""
+        stats = pstats.Stats(self.profile).stats
+        # Without the wrappers of the profiler itself.
+        functions = [item for item in stats.items() if item[0][0] != __file__]
+        top = sorted(functions, key=lambda item: item[1][2], reverse=True)[
+            :TOP_FUNCTIONS
+        ]
+        return {
+            "duration": round(self._duration, 1),
+            "stages": {name: stat.as_dict() for name, stat in self.stages.items()},
+            "entity_classes": {
+                entity_class: {kind: stat.as_dict() for kind, stat in kinds.items()}
+                for entity_class, kinds in sorted(self.entities.items())
+            },
+            "top_functions": [
+                {
+                    "function": f"{Path(file).name}:{line}({name})",
+                    "calls": calls,
+                    "own_ms": round(own * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+                for (file, line, name), (_, calls, own, cumulative, _) in top
+            ],
+        }
@@ -0,0 +1,82 @@
+"""Receive data pushed by the dongle instead of polling it."""
+from __future__ import annotations
+
+from http import HTTPStatus
+import logging
+import time
+
+from aiohttp import web
+
+from homeassistant.components.http import KEY_AUTHENTICATED, HomeAssistantView
+from homeassistant.core import HomeAssistant
+from homeassistant.util.json import json_loads
+
+from .const import DATA_SITE, DOMAIN, PUSH_RESOLVE_SECONDS
+from .hub import ENDPOINTS, Hub
+
+_LOGGER = logging.getLogger(__name__)
+
+# getdevdata.cgi device number -> endpoint name.
+DEVICE_ENDPOINTS = {str(device): endpoint for endpoint, device in ENDPOINTS.items()}
+
+
+async def _async_is_host(hass: HomeAssistant, hub: Hub, remote: str | None) -> bool:
+    """Return True if remote is an address of the inverter's configured host.
+
+    A host name is resolved again at most every PUSH_RESOLVE_SECONDS, so a
+    dongle whose address changed is followed.
+    """
+    if remote is None:
+        return False
+    if remote == hub.host_address:
+        return True
+    now = time.monotonic()
+    if hub.resolved_at is None or now - hub.resolved_at > PUSH_RESOLVE_SECONDS:
+        hub.resolved_at = now
+        try:
+            infos = await hass.loop.getaddrinfo(hub.host_address, None)
+        except OSError as err:
+            _LOGGER.debug("Unable to resolve %s: %s", hub.host_address, err)
+            hub.resolved_addresses = set()
+        else:
+            hub.resolved_addresses = {info[4][0] for info in infos}
+    return remote in hub.resolved_addresses
+
+
+class SolplanetPushView(HomeAssistantView):
+    """Accept getdevdata.cgi payloads posted by the dongle or a relay.
+
+    POST /api/solplanet/push/<serial>?device=<n> with the same JSON the dongle
+    answers to getdevdata.cgi?device=<n>&sn=<serial>. Requests are accepted
+    from the inverter's configured host, resolved if it is a host name, or
+    with a Home Assistant token from anywhere else.
+    """
+
+    url = "/api/solplanet/push/{serial}"
+    name = "api:solplanet:push"
+    requires_auth = False
+
+    async def post(self, request: web.Request, serial: str) -> web.Response:
+        """Handle a pushed data frame."""
+        hass = request.app["hass"]
+        site = hass.data.get(DOMAIN, {}).get(DATA_SITE)
+        hub = site.hubs.get(serial.lower()) if site else None
+        if hub is None or not hub.push:
+            return self.json_message("Unknown inverter", HTTPStatus.NOT_FOUND)
+        if not request[KEY_AUTHENTICATED] and not await _async_is_host(
+            hass, hub, request.remote
+        ):
+            return self.json_message("Forbidden", HTTPStatus.FORBIDDEN)
+
+        endpoint = DEVICE_ENDPOINTS.get(request.query.get("device", ""))
+        if endpoint is None:
+            return self.json_message("Unknown device", HTTPStatus.BAD_REQUEST)
+        try:
+            payload = json_loads(await request.read())
+        except ValueError:
+            return self.json_message("Invalid JSON", HTTPStatus.BAD_REQUEST)
+        if not isinstance(payload, dict):
+            return self.json_message("Expected a JSON object", HTTPStatus.BAD_REQUEST)
+
+        site.push(hub, endpoint, payload)
+        return self.json_message("OK")
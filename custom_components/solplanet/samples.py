@@ -0,0 +1,132 @@
+"""Bounded in-memory history of high resolution samples."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+import math
+
+from .sensor_descriptions import SENSORS
+
+# Values kept at full resolution, as (device, key).
+SAMPLED_VALUES = tuple(
+    (description.device, description.key)
+    for description in SENSORS
+    if description.kind in ("power", "voltage", "current", "charge")
+)
+
+
+class SampleBuffer:
+    """Ring buffer holding the most recent samples of every sampled value.
+
+    Samples are stored in one array of doubles per value (plus one for the
+    timestamps), each holding `capacity` samples. Missing values are
+    stored as NaN. Samples less than `min_interval` seconds after the newest
+    one update it instead, so e.g. the frames of several endpoints pushed in
+    one update cycle take a single sample.
+    """
+
+    def __init__(self, capacity: int, min_interval: float = 0.0) -> None:
+        """Initialize buffer."""
+        self._min_interval = min_interval
+        self.channels = [f"{device}.{key}" for device, key in SAMPLED_VALUES]
+        self.capacity = max(capacity, 1)
+        self._times = array("d", [math.nan]) * self.capacity
+        self._values = [array("d", [math.nan]) * self.capacity for _ in SAMPLED_VALUES]
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._count
+
+    @property
+    def oldest(self) -> float | None:
+        """Return the time of the oldest sample held, None if there is none."""
+        if not self._count:
+            return None
+        return self._times[(self._next - self._count) % self.capacity]
+
+    def append(self, timestamp: float, data: dict[str, dict]) -> None:
+        """Store the sampled values of data, overwriting the oldest sample."""
+        newest = (self._next - 1) % self.capacity
+        if self._count and timestamp - self._times[newest] < self._min_interval:
+            # Same update cycle; keep the newest sample's time.
+            self._store(newest, data)
+            return
+        row = self._next
+        self._times[row] = timestamp
+        self._store(row, data)
+        self._next = (row + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _store(self, row: int, data: dict[str, dict]) -> None:
+        for values, (device, key) in zip(self._values, SAMPLED_VALUES):
+            value = data[device].get(key)
+            values[row] = math.nan if value is None else value
+
+    def _rows(self, since: float | None) -> Iterator[int]:
+        """Yield the rows from oldest to newest, starting at `since`."""
+        first = (self._next - self._count) % self.capacity
+        for offset in range(self._count):
+            row = (first + offset) % self.capacity
+            if since is None or self._times[row] >= since:
+                yield row
+
+    def samples(self, since: float | None = None) -> list[dict]:
+        """Return the raw samples taken at or after `since`."""
+        return [
+            {
+                "time": self._times[row],
+                "values": {
+                    channel: values[row]
+                    for channel, values in zip(self.channels, self._values)
+                    if not math.isnan(values[row])
+                },
+            }
+            for row in self._rows(since)
+        ]
+
+    def downsample(self, window: float, since: float | None = None) -> list[dict]:
+        """Return min, max and mean of every value per `window` seconds.
+
+        Buckets are aligned to multiples of `window` and only cover samples
+        taken at or after `since`.
+        """
+        buckets: list[dict] = []
+        bucket_start = None
+        stats: list[list[float]] = []
+        for row in self._rows(since):
+            start = self._times[row] // window * window
+            if start != bucket_start:
+                if bucket_start is not None:
+                    buckets.append(self._bucket(bucket_start, stats))
+                bucket_start = start
+                # [min, max, sum, count] per channel.
+                stats = [[math.inf, -math.inf, 0.0, 0] for _ in self._values]
+            for channel_stats, values in zip(stats, self._values):
+                value = values[row]
+                if math.isnan(value):
+                    continue
+                channel_stats[0] = min(channel_stats[0], value)
+                channel_stats[1] = max(channel_stats[1], value)
+                channel_stats[2] += value
+                channel_stats[3] += 1
+        if bucket_start is not None:
+            buckets.append(self._bucket(bucket_start, stats))
+        return buckets
+
+    def _bucket(self, start: float, stats: list[list[float]]) -> dict:
+        return {
+            "start": start,
+            "values": {
+                channel: {
+                    "min": minimum,
+                    "max": maximum,
+                    "mean": round(total / count, 3),
+                }
+                for channel, (minimum, maximum, total, count) in zip(
+                    self.channels, stats
+                )
+                if count
+            },
+        }
@@ -0,0 +1,53 @@
+"""Adaptive poll scheduling for the dongle endpoints."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+
+class EndpointSchedule:
+    """Poll interval for one endpoint that adapts to how fast its data changes.
+
+    The interval starts at `min_interval` and doubles up to `max_interval` for
+    every poll in which none of the watched fields changed. Any change drops it
+    back to `min_interval`. When `idle_key` is set and reads zero (e.g. no solar
+    output at night) the endpoint is polled at `idle_interval` instead.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        watch_keys: Iterable[str] = (),
+        idle_key: str | None = None,
+        idle_interval: float | None = None,
+    ) -> None:
+        """Initialize schedule."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.next_poll = 0.0
+        self._watch_keys = tuple(watch_keys)
+        self._idle_key = idle_key
+        self._idle_interval = idle_interval or max_interval
+        self._last_values: tuple | None = None
+
+    def is_due(self, now: float) -> bool:
+        """Return True if the endpoint should be polled at `now`."""
+        return now >= self.next_poll
+
+    def record(self, now: float, payload: dict | None) -> None:
+        """Adjust the interval from the payload returned by a poll at `now`."""
+        if not isinstance(payload, dict):
+            # Failed polls, and answers that are not a JSON object, are retried
+            # at the fast rate.
+            self.interval = self.min_interval
+        else:
+            values = tuple(payload.get(key) for key in self._watch_keys)
+            if self._idle_key is not None and not payload.get(self._idle_key):
+                self.interval = self._idle_interval
+            elif values != self._last_values:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+            self._last_values = values
+        self.next_poll = now + self.interval
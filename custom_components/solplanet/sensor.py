@@ -1,25 +1,67 @@
 """Platform for sensor integration."""
 
-from .const import DOMAIN
-from .sensor_definitions import Coordinator
-from .sensor_initialization import (
-    create_battery_sensors,
-    create_meter_sensors,
-    create_solar_sensors,
-)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from .const import DATA_SITE, DOMAIN
+from .hub import Hub
+from .sensor_definitions import sensor_unique_id
+from .sensor_initialization import create_sensors
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add sensors for passed config_entry in HA."""
     hub = hass.data[DOMAIN][config_entry.entry_id]
+    site = hass.data[DOMAIN][DATA_SITE]
+
+    # The first data was already fetched when the hub joined the site.
+    coord = site.coordinator
+
+    # Only sensors of what the inverter has, as far as it is known yet.
+    async_add_entities(create_sensors(hub, coord, hub.descriptions))
+
+    # Sensors of endpoints that are still pending are created too, and removed
+    # again once the endpoint is ruled out.
+    _async_remove_unsupported(hass, config_entry, hub)
+    config_entry.async_on_unload(
+        hub.async_add_capabilities_listener(
+            lambda: _async_remove_unsupported(hass, config_entry, hub)
+        )
+    )
 
-    coord = Coordinator(hass, hub)
-    await coord.async_config_entry_first_refresh()
+    # Site totals are added by one of the entries once there is more than one
+    # inverter.
+    site.register_platform(config_entry.entry_id, async_add_entities)
 
-    new_entities = []
 
-    new_entities += create_meter_sensors(hub, coord)
-    new_entities += create_solar_sensors(hub, coord)
-    new_entities += create_battery_sensors(hub, coord)
+@callback
+def _async_remove_unsupported(
+    hass: HomeAssistant, config_entry: ConfigEntry, hub: Hub
+) -> None:
+    """Remove the sensors, and then devices, the inverter turned out not to have."""
+    entity_registry = er.async_get(hass)
+    supported = {
+        sensor_unique_id(hub.hub_id, description.device, description.name)
+        for description in hub.descriptions
+    }
+    for entry in er.async_entries_for_config_entry(
+        entity_registry, config_entry.entry_id
+    ):
+        if (
+            entry.domain == "sensor"
+            and entry.unique_id.startswith(f"{hub.hub_id}_")
+            and entry.unique_id not in supported
+        ):
+            entity_registry.async_remove(entry.entity_id)
 
-    async_add_entities(new_entities)
+    device_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(
+        device_registry, config_entry.entry_id
+    ):
+        if not er.async_entries_for_device(
+            entity_registry, device.id, include_disabled_entities=True
+        ):
+            device_registry.async_update_device(
+                device.id, remove_config_entry_id=config_entry.entry_id
+            )
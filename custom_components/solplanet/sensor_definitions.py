@@ -1,13 +1,23 @@
-from asyncio import timeout
+from __future__ import annotations
+
 from datetime import timedelta
 import logging
+import time
+from typing import TYPE_CHECKING
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
-from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfEnergy, UnitOfPower
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfPower,
+    UnitOfTime,
+)
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -18,13 +28,21 @@ from homeassistant.helpers.update_coordinator import (
 from .const import DOMAIN, UPDATE_INTERVAL_SECONDS
 from .hub import Hub
 
+if TYPE_CHECKING:
+    from .site import Site
+
 _LOGGER = logging.getLogger(__name__)
 
 
+def sensor_unique_id(hub_id: str, device_key: str, name: str) -> str:
+    """Return the unique id of the sensor name of a hub's device."""
+    return f"{hub_id}_{device_key.lower()}_{name.lower()}"
+
+
 class Coordinator(DataUpdateCoordinator):
-    """Custom coordinator."""
+    """Custom coordinator polling every inverter of the site."""
 
-    def __init__(self, hass: HomeAssistant, hub: Hub):
+    def __init__(self, hass: HomeAssistant, site: Site):
         """Initialize coordinator."""
         super().__init__(
             hass,
@@ -32,16 +50,40 @@ class Coordinator(DataUpdateCoordinator):
             name="Solplanet",
             update_interval=timedelta(seconds=UPDATE_INTERVAL_SECONDS),
         )
-        self.hub = hub
+        self.site = site
+        # How late the last update started compared to its schedule.
+        self.cycle_overrun = 0.0
+        self._next_update = None
 
     async def _async_update_data(self):
-        async with timeout(10):
-            return await self.hub.fetch_data()
+        start = time.monotonic()
+        if self._next_update is not None:
+            self.cycle_overrun = max(start - self._next_update, 0)
+
+        # No overall timeout: every request has its own and every sweep its
+        # budget, so dongles queued behind others never fail the update.
+        try:
+            data = await self.site.fetch_data()
+        except ConnectionError as err:
+            raise UpdateFailed(err) from err
+
+        # Sleep until the next endpoint is due instead of waking every tick.
+        interval = max(self.site.seconds_until_next_poll(), UPDATE_INTERVAL_SECONDS)
+        self.update_interval = timedelta(seconds=interval)
+        self._next_update = time.monotonic() + interval
+        return data
 
 
 class Sensor(CoordinatorEntity, SensorEntity):
     """Base sensor interacting with manager hub."""
 
+    # Smallest change, in native units, that is written to the state machine.
+    # Smaller moves are dropped to keep the recorder and event bus quiet.
+    _deadband = 0
+    # High frequency values write their state at most every
+    # hub.state_interval seconds, when that option is set.
+    _high_frequency = False
+
     def __init__(
         self,
         name: str,
@@ -57,18 +99,53 @@ class Sensor(CoordinatorEntity, SensorEntity):
         if entity_category:
             self._attr_entity_category = entity_category
 
-        self._attr_unique_id = f"{hub._id}_{device_key.lower()}_{name.lower()}"
+        self._attr_unique_id = sensor_unique_id(hub.hub_id, device_key, name)
         self._attr_name = f"{hub.devices[device_key].name} {name}"
 
         self._device_key = device_key
         self._data_key = data_key
 
         self._hub = hub
-
-    # @callback
-    # def _handle_coordinator_update(self) -> None:
-    #     """Handle updated data from the coordinator."""
-    #     self.async_write_ha_state()
+        # The hub updates its values in place, so this stays current.
+        self._values = hub.data[device_key]
+
+        self._written_available = None
+        self._written_value = None
+        self._written_stale = None
+        self._written_at = 0.0
+        self._write_interval = hub.state_interval if self._high_frequency else 0
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only if availability or the value actually changed."""
+        value = self._values.get(self._data_key)
+        available = self._hub.online and value is not None
+        stale = self._hub.stale
+        if (
+            available == self._written_available
+            and stale == self._written_stale
+            and (
+                not self._value_changed(value)
+                or time.monotonic() - self._written_at < self._write_interval
+            )
+        ):
+            return
+        self._written_available = available
+        self._written_value = value
+        self._written_stale = stale
+        self._written_at = time.monotonic()
+        self.async_write_ha_state()
+
+    def _value_changed(self, value) -> bool:
+        """Return True if value moved past the deadband since the last write."""
+        last = self._written_value
+        if (
+            self._deadband
+            and isinstance(value, (int, float))
+            and isinstance(last, (int, float))
+        ):
+            return abs(value - last) >= self._deadband
+        return value != last
 
     @property
     def device_info(self):
@@ -77,19 +154,18 @@ class Sensor(CoordinatorEntity, SensorEntity):
 
     @property
     def available(self) -> bool:
-        """Return True if roller and hub is available."""
-        if self._device_key not in self.coordinator.data:
-            return False
-        if self._data_key not in self.coordinator.data[self._device_key]:
-            return False
-        if self.coordinator.data[self._device_key][self._data_key] is None:
-            return False
-        return True
+        """Return True if the hub is online and reported a value."""
+        return self._hub.online and self._values.get(self._data_key) is not None
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Mark values cached from before a restart as stale."""
+        return {"stale": True} if self._hub.stale else None
 
     @property
     def state(self) -> float:
         """Return the state of the sensor."""
-        return self.coordinator.data[self._device_key][self._data_key]
+        return self._values.get(self._data_key)
 
 
 class VoltageSensor(Sensor):
@@ -97,6 +173,8 @@ class VoltageSensor(Sensor):
     # _attr_unit_of_measurement = "V"
     _attr_native_unit_of_measurement = "V"
     # _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _deadband = 0.5
+    _high_frequency = True
 
     def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
         super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
@@ -106,6 +184,7 @@ class CurrentSensor(Sensor):
     device_class = SensorDeviceClass.CURRENT
     # _attr_unit_of_measurement = "A"
     _attr_native_unit_of_measurement = "A"
+    _high_frequency = True
 
     def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
         super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
@@ -114,6 +193,8 @@ class CurrentSensor(Sensor):
 class PowerSensor(Sensor):
     device_class = SensorDeviceClass.POWER
     _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _deadband = 0.01  # 10 W
+    _high_frequency = True
 
     def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
         super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
@@ -122,7 +203,7 @@ class PowerSensor(Sensor):
 class EnergySensor(Sensor):
     # _attr_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
     _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-    _attr_device_class = SensorDeviceClass.POWER
+    _attr_device_class = SensorDeviceClass.ENERGY
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
 
     def __init__(
@@ -146,3 +227,42 @@ class ChargeSensor(Sensor):
 
     def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
         super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
+
+
+class RatioSensor(Sensor):
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _deadband = 0.5
+
+    def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
+        super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
+
+
+class DurationSensor(Sensor):
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_registry_enabled_default = False
+    _deadband = 50
+
+    def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
+        super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
+
+
+class CountSensor(Sensor):
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
+        super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
+
+
+class DataSizeSensor(Sensor):
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_entity_registry_enabled_default = False
+    _deadband = 10240
+
+    def __init__(self, name, device_key, data_key, hub, coordinator, **kwargs):
+        super().__init__(name, device_key, data_key, hub, coordinator, **kwargs)
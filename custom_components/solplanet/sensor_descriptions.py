@@ -0,0 +1,474 @@
+"""Declarative table of every sensor and the raw dongle field it reads."""
+from __future__ import annotations
+
+from homeassistant.const import EntityCategory
+
+DIAGNOSTIC = EntityCategory.DIAGNOSTIC
+
+
+class SensorDescription:
+    """Description of one sensor value.
+
+    `endpoint`, `field` and `index` locate the raw value in the dongle
+    payloads, and dividing by `divisor` converts it to the sensor's native
+    unit. Values that are not read from the dongle (e.g. computed site totals)
+    have no endpoint. Energy values with `integral_of` are computed from that
+    power value of the same device whenever the dongle does not report them.
+    `requires` is an (endpoint, field, index) raw value, or an endpoint with
+    field None, that must be present for computed values to exist.
+    """
+
+    __slots__ = (
+        "device",
+        "key",
+        "name",
+        "kind",
+        "category",
+        "endpoint",
+        "field",
+        "index",
+        "divisor",
+        "integral_of",
+        "requires",
+    )
+
+    def __init__(
+        self,
+        device: str,
+        key: str,
+        name: str,
+        kind: str,
+        category: EntityCategory | None = None,
+        endpoint: str | None = None,
+        field: str | None = None,
+        index: int | None = None,
+        divisor: int = 1,
+        integral_of: str | None = None,
+        requires: tuple[str, str | None, int | None] | None = None,
+    ) -> None:
+        """Initialize description."""
+        self.device = device
+        self.key = key
+        self.name = name
+        self.kind = kind
+        self.category = category
+        self.endpoint = endpoint
+        self.field = field
+        self.index = index
+        self.divisor = divisor
+        self.integral_of = integral_of
+        self.requires = requires
+
+
+D = SensorDescription
+
+# Raw values computed values depend on, see SensorDescription.requires.
+METER = ("meter", None, None)
+BATTERY = ("battery", None, None)
+MPPT_1 = ("inverter", "vpv", 0)
+MPPT_2 = ("inverter", "vpv", 1)
+
+# Divisors follow the dongle's units: voltages in 0.1 V (0.01 V for the
+# battery), currents in 0.1 A, energies in 0.1 kWh and power in W.
+SENSORS: tuple[SensorDescription, ...] = (
+    # Meter
+    D(
+        "meter",
+        "grid_power",
+        "Power grid",
+        "power",
+        endpoint="meter",
+        field="pac",
+        divisor=1000,
+    ),
+    D("meter", "export_power", "Power export", "power", requires=METER),
+    D("meter", "import_power", "Power import", "power", requires=METER),
+    D("meter", "consumed_power", "Power consumed", "power", requires=METER),
+    D(
+        "meter",
+        "export_energy",
+        "Energy export",
+        "energy",
+        endpoint="meter",
+        field="oet",
+        divisor=10,
+        integral_of="export_power",
+    ),
+    D(
+        "meter",
+        "import_energy",
+        "Energy import",
+        "energy",
+        endpoint="meter",
+        field="iet",
+        divisor=10,
+        integral_of="import_power",
+    ),
+    D(
+        "meter",
+        "consumed_energy",
+        "Energy consumed",
+        "energy",
+        integral_of="consumed_power",
+        requires=METER,
+    ),
+    D(
+        "meter",
+        "voltage_1",
+        "Voltage phase 1",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="vac",
+        index=0,
+        divisor=10,
+    ),
+    D(
+        "meter",
+        "voltage_2",
+        "Voltage phase 2",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="vac",
+        index=1,
+        divisor=10,
+    ),
+    D(
+        "meter",
+        "voltage_3",
+        "Voltage phase 3",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="vac",
+        index=2,
+        divisor=10,
+    ),
+    D(
+        "meter",
+        "current_1",
+        "Current phase 1",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="iac",
+        index=0,
+        divisor=10,
+    ),
+    D(
+        "meter",
+        "current_2",
+        "Current phase 2",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="iac",
+        index=1,
+        divisor=10,
+    ),
+    D(
+        "meter",
+        "current_3",
+        "Current phase 3",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="iac",
+        index=2,
+        divisor=10,
+    ),
+    # Solar
+    D(
+        "solar",
+        "power_total",
+        "Power out",
+        "power",
+        endpoint="battery",
+        field="ppv",
+        divisor=1000,
+    ),
+    D(
+        "solar",
+        "power_1",
+        "Power out circuit 1",
+        "power",
+        category=DIAGNOSTIC,
+        requires=MPPT_1,
+    ),
+    D(
+        "solar",
+        "power_2",
+        "Power out circuit 2",
+        "power",
+        category=DIAGNOSTIC,
+        requires=MPPT_2,
+    ),
+    D(
+        "solar",
+        "energy_total",
+        "Energy out",
+        "energy",
+        endpoint="inverter",
+        field="eto",
+        divisor=10,
+        integral_of="power_total",
+    ),
+    D(
+        "solar",
+        "energy_1",
+        "Energy out circuit 1",
+        "energy",
+        category=DIAGNOSTIC,
+        integral_of="power_1",
+        requires=MPPT_1,
+    ),
+    D(
+        "solar",
+        "energy_2",
+        "Energy out circuit 2",
+        "energy",
+        category=DIAGNOSTIC,
+        integral_of="power_2",
+        requires=MPPT_2,
+    ),
+    D(
+        "solar",
+        "voltage_1",
+        "Voltage circuit 1",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="vpv",
+        index=0,
+        divisor=10,
+    ),
+    D(
+        "solar",
+        "voltage_2",
+        "Voltage circuit 2",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="vpv",
+        index=1,
+        divisor=10,
+    ),
+    D(
+        "solar",
+        "current_1",
+        "Current circuit 1",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="ipv",
+        index=0,
+        divisor=10,
+    ),
+    D(
+        "solar",
+        "current_2",
+        "Current circuit 2",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="inverter",
+        field="ipv",
+        index=1,
+        divisor=10,
+    ),
+    # Battery
+    D(
+        "battery",
+        "energy_in_total",
+        "Energy In",
+        "energy",
+        endpoint="battery",
+        field="ebi",
+        divisor=10,
+    ),
+    D(
+        "battery",
+        "energy_out_total",
+        "Energy Out",
+        "energy",
+        endpoint="battery",
+        field="ebo",
+        divisor=10,
+    ),
+    D(
+        "battery",
+        "power",
+        "Power",
+        "power",
+        endpoint="battery",
+        field="pb",
+        divisor=1000,
+    ),
+    D(
+        "battery",
+        "state_of_charge",
+        "State of charge",
+        "charge",
+        endpoint="battery",
+        field="soc",
+    ),
+    D(
+        "battery",
+        "voltage",
+        "Voltage",
+        "voltage",
+        category=DIAGNOSTIC,
+        endpoint="battery",
+        field="vb",
+        divisor=100,
+    ),
+    D(
+        "battery",
+        "current",
+        "Current",
+        "current",
+        category=DIAGNOSTIC,
+        endpoint="battery",
+        field="cb",
+        divisor=10,
+    ),
+    # Inverter, with the power flows computed by power_flow.update_power_flow
+    D(
+        "inverter",
+        "power_out",
+        "Power out",
+        "power",
+        endpoint="inverter",
+        field="pac",
+        divisor=1000,
+    ),
+    D("inverter", "power_in_solar", "Power in solar", "power", category=DIAGNOSTIC),
+    D(
+        "inverter",
+        "power_in_battery",
+        "Power in battery",
+        "power",
+        category=DIAGNOSTIC,
+        requires=BATTERY,
+    ),
+    D("inverter", "power_in_total", "Power in total", "power", category=DIAGNOSTIC),
+    D("inverter", "self_consumption", "Self consumption", "ratio", requires=METER),
+    D("inverter", "solar_to_load", "Power solar to house", "power", requires=METER),
+    D(
+        "inverter",
+        "solar_to_battery",
+        "Power solar to battery",
+        "power",
+        requires=BATTERY,
+    ),
+    D(
+        "inverter",
+        "battery_to_load",
+        "Power battery to house",
+        "power",
+        requires=BATTERY,
+    ),
+    # Poll instrumentation, filled in by the hub's PollMetrics
+    D("inverter", "poll_duration", "Poll duration", "duration", category=DIAGNOSTIC),
+    D(
+        "inverter",
+        "cycle_overrun",
+        "Poll cycle overrun",
+        "duration",
+        category=DIAGNOSTIC,
+    ),
+    D(
+        "inverter",
+        "latency_inverter",
+        "Inverter request latency",
+        "duration",
+        category=DIAGNOSTIC,
+    ),
+    D(
+        "inverter",
+        "latency_meter",
+        "Meter request latency",
+        "duration",
+        category=DIAGNOSTIC,
+        requires=METER,
+    ),
+    D(
+        "inverter",
+        "latency_battery",
+        "Battery request latency",
+        "duration",
+        category=DIAGNOSTIC,
+        requires=BATTERY,
+    ),
+    D("inverter", "request_errors", "Request errors", "count", category=DIAGNOSTIC),
+    D("inverter", "request_timeouts", "Request timeouts", "count", category=DIAGNOSTIC),
+    D("inverter", "bytes_received", "Bytes received", "data_size", category=DIAGNOSTIC),
+)
+
+# Site totals, computed from every inverter's values by the site.
+SITE_SENSORS: tuple[SensorDescription, ...] = (
+    D("site", "power_solar", "Power solar", "power"),
+    D("site", "power_battery", "Power battery", "power"),
+    D("site", "power_export", "Power export", "power"),
+    D("site", "power_import", "Power import", "power"),
+    D("site", "consumed_power", "Power consumed", "power"),
+    D("site", "self_consumption", "Self consumption", "ratio"),
+    D("site", "solar_to_load", "Power solar to house", "power"),
+    D("site", "solar_to_battery", "Power solar to battery", "power"),
+    D("site", "battery_to_load", "Power battery to house", "power"),
+    D("site", "energy_solar", "Energy solar", "energy"),
+    D("site", "energy_export", "Energy export", "energy"),
+    D("site", "energy_import", "Energy import", "energy"),
+)
+
+DEVICES = ("inverter", "battery", "meter", "solar")
+
+
+def _fields_by_endpoint() -> dict[str, tuple]:
+    """Group the raw field lookups of SENSORS by endpoint."""
+    fields: dict[str, list] = {}
+    for description in SENSORS:
+        if description.endpoint is not None:
+            fields.setdefault(description.endpoint, []).append(
+                (
+                    description.device,
+                    description.key,
+                    description.field,
+                    description.index,
+                    description.divisor,
+                )
+            )
+    return {endpoint: tuple(lookups) for endpoint, lookups in fields.items()}
+
+
+# Precomputed once so a poll is a single pass over each payload.
+_FIELDS_BY_ENDPOINT = _fields_by_endpoint()
+
+
+def empty_result() -> dict[str, dict]:
+    """Return values by device and key with every described value None."""
+    result: dict[str, dict] = {device: {} for device in DEVICES}
+    for description in SENSORS:
+        result[description.device][description.key] = None
+    return result
+
+
+def update_from_payload(result: dict[str, dict], endpoint: str, payload) -> None:
+    """Update result in place with the values read from one endpoint payload.
+
+    Values whose field is missing, or all values of the endpoint if the
+    payload is None, are set to None.
+    """
+    if not isinstance(payload, dict):
+        payload = {}
+    for device, key, field, index, divisor in _FIELDS_BY_ENDPOINT.get(endpoint, ()):
+        value = payload.get(field)
+        # Firmware versions differ in which fields are lists and numbers;
+        # values of an unexpected type read as missing.
+        if index is not None:
+            value = (
+                value[index] if isinstance(value, list) and len(value) > index else None
+            )
+        if divisor != 1:
+            value = value / divisor if isinstance(value, (int, float)) else None
+        result[device][key] = value
@@ -0,0 +1,102 @@
+"""Services for the Solplanet integration."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .const import DATA_PROFILER, DATA_SITE, DOMAIN
+from .profiler import PollProfiler
+
+SERVICE_GET_SAMPLES = "get_samples"
+SERVICE_PROFILE = "profile"
+
+GET_SAMPLES_SCHEMA = vol.Schema(
+    {
+        vol.Required("inverter_id"): cv.string,
+        vol.Optional("window", default=60): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+        vol.Optional("duration", default=3600): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+        vol.Optional("raw", default=False): cv.boolean,
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+
+def _get_hub(hass: HomeAssistant, inverter_id: str):
+    """Return the hub of the inverter with serial number inverter_id."""
+    site = hass.data.get(DOMAIN, {}).get(DATA_SITE)
+    hub = site.hubs.get(inverter_id.lower()) if site else None
+    if hub is None:
+        raise HomeAssistantError(f"Unknown inverter {inverter_id}")
+    return hub
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services."""
+
+    async def get_samples(call: ServiceCall) -> ServiceResponse:
+        """Return the recent full resolution history of an inverter."""
+        hub = _get_hub(hass, call.data["inverter_id"])
+        since = time.time() - call.data["duration"]
+        if call.data["raw"]:
+            return {"samples": hub.samples.samples(since)}
+        return {
+            "window": call.data["window"],
+            "buckets": hub.samples.downsample(call.data["window"], since),
+        }
+
+    async def profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the poll and update path for a while and return a summary."""
+        domain_data = hass.data.setdefault(DOMAIN, {})
+        if DATA_PROFILER in domain_data:
+            raise HomeAssistantError("A profile is already running")
+        profiler = PollProfiler()
+        try:
+            profiler.start()
+        except ValueError as err:
+            raise HomeAssistantError(f"Unable to profile: {err}") from err
+        domain_data[DATA_PROFILER] = profiler
+        try:
+            await asyncio.sleep(call.data["duration"])
+        finally:
+            profiler.stop()
+            del domain_data[DATA_PROFILER]
+        path = hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.prof")
+        await hass.async_add_executor_job(profiler.dump, path)
+        return {"file": path, **profiler.summary()}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SAMPLES,
+        get_samples,
+        schema=GET_SAMPLES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
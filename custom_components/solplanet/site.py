@@ -0,0 +1,245 @@
+"""Site level polling shared by every configured inverter."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN, MAX_CONCURRENT_POLLS, UPDATE_INTERVAL_SECONDS
+from .devices import Site as SiteDevice
+from .dongle import Dongle
+from .hub import Hub
+from .power_flow import power_flow
+from .sensor_definitions import Coordinator, sensor_unique_id
+from .sensor_descriptions import SITE_SENSORS
+from .sensor_initialization import create_site_sensors
+
+_LOGGER = logging.getLogger(__name__)
+
+SITE_ID = "site"
+
+# Site total -> (device, data key) summed over every inverter.
+SITE_TOTALS = {
+    "power_solar": ("solar", "power_total"),
+    "energy_solar": ("solar", "energy_total"),
+    "power_battery": ("battery", "power"),
+    "power_export": ("meter", "export_power"),
+    "power_import": ("meter", "import_power"),
+    "energy_export": ("meter", "export_energy"),
+    "energy_import": ("meter", "import_energy"),
+}
+
+# Totals that only ever increase. An inverter that misses a poll counts with
+# its last value, so the total does not drop and read as a meter reset.
+HELD_TOTALS = ("energy_solar", "energy_export", "energy_import")
+
+# Inputs of the site wide power flow, summed over every inverter.
+SITE_FLOW_INPUTS = (
+    ("solar", "power_total"),
+    ("battery", "power"),
+    ("meter", "grid_power"),
+    ("inverter", "power_out"),
+)
+
+# Power flows of the whole site, computed from the summed inputs.
+SITE_FLOWS = (
+    "consumed_power",
+    "self_consumption",
+    "solar_to_load",
+    "solar_to_battery",
+    "battery_to_load",
+)
+
+
+class Site:
+    """All inverters of one installation, polled by a single coordinator.
+
+    Every dongle sweeps the inverters on its bus in the same update, with at
+    most MAX_CONCURRENT_POLLS dongles polled at once. The coordinator data is
+    keyed by hub id, plus a SITE_ID entry holding the site totals.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize site."""
+        self._hass = hass
+        self._id = SITE_ID
+        self.online = True
+        self.state_interval = 0
+        # Sensor platforms by config entry id, and the entry whose platform
+        # owns the site total entities.
+        self._platforms: dict[str, AddEntitiesCallback] = {}
+        self._totals_owner: str | None = None
+
+        self.hubs: dict[str, Hub] = {}
+        # Last value of every inverter by HELD_TOTALS key and hub id.
+        self._held: dict[str, dict[str, float]] = {key: {} for key in HELD_TOTALS}
+        # Coordinator data, updated in place on every poll.
+        self._data: dict[str, dict] = {
+            SITE_ID: {"site": dict.fromkeys((*SITE_TOTALS, *SITE_FLOWS))}
+        }
+        self.devices = {"site": SiteDevice()}
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self.coordinator = Coordinator(hass, self)
+
+    @property
+    def hub_id(self) -> str:
+        """ID for the site, used like a hub id in the coordinator data."""
+        return self._id
+
+    @property
+    def data(self) -> dict:
+        """Site totals by device and key."""
+        return self._data[SITE_ID]
+
+    async def async_add_hub(self, hub: Hub) -> None:
+        """Fetch the first data of hub and add it to the shared poll loop.
+
+        Raises ConnectionError if the inverter does not answer.
+        """
+        await hub.fetch_data()
+        self.add_hub(hub)
+
+    def add_hub(self, hub: Hub) -> None:
+        """Add hub with its current, e.g. cached, values to the poll loop."""
+        self._data[hub.hub_id] = hub.data
+        self.hubs[hub.hub_id] = hub
+        hub.coordinator = self.coordinator
+        hub.dongle.add_hub(hub)
+        self._update_totals()
+
+        # Merge the new hub without rescheduling the refreshes of the others.
+        self.coordinator.data = self._data
+        self.coordinator.async_update_listeners()
+
+    def push(self, hub: Hub, endpoint: str, payload: dict) -> None:
+        """Update hub from a pushed payload and notify the entities."""
+        hub.ingest(endpoint, payload)
+        self._data[hub.hub_id] = hub.data
+        self._update_totals()
+        # Notify the entities without moving the next scheduled poll.
+        self.coordinator.async_update_listeners()
+
+    def remove_hub(self, entry_id: str, hub: Hub) -> None:
+        """Stop polling hub, which was set up by config entry entry_id."""
+        self.hubs.pop(hub.hub_id, None)
+        self._data.pop(hub.hub_id, None)
+        hub.coordinator = None
+        for held in self._held.values():
+            held.pop(hub.hub_id, None)
+        hub.dongle.remove_hub(hub)
+        self._update_totals()
+
+        self._platforms.pop(entry_id, None)
+        if self._totals_owner is not None and len(self.hubs) < 2:
+            # With a single inverter left the totals would only repeat its
+            # values.
+            self._remove_site_sensors()
+        elif self._totals_owner == entry_id:
+            # The site total entities went away with the owner's platform.
+            self._totals_owner = None
+            self._add_site_sensors()
+
+    def register_platform(
+        self, entry_id: str, async_add_entities: AddEntitiesCallback
+    ) -> None:
+        """Register the sensor platform of a config entry."""
+        self._platforms[entry_id] = async_add_entities
+        self._add_site_sensors()
+
+    def _add_site_sensors(self) -> None:
+        """Add the site totals once the site has more than one inverter."""
+        if self._totals_owner is not None or len(self.hubs) < 2 or not self._platforms:
+            return
+        self._totals_owner, async_add_entities = next(iter(self._platforms.items()))
+        async_add_entities(create_site_sensors(self, self.coordinator))
+
+    def _remove_site_sensors(self) -> None:
+        """Remove the site total entities and their device.
+
+        They are added again when a second inverter is set up.
+        """
+        self._totals_owner = None
+        entity_registry = er.async_get(self._hass)
+        for description in SITE_SENSORS:
+            if entity_id := entity_registry.async_get_entity_id(
+                "sensor",
+                DOMAIN,
+                sensor_unique_id(self.hub_id, description.device, description.name),
+            ):
+                entity_registry.async_remove(entity_id)
+        device_registry = dr.async_get(self._hass)
+        if device := device_registry.async_get_device(identifiers={(DOMAIN, SITE_ID)}):
+            device_registry.async_remove_device(device.id)
+
+    @property
+    def stale(self) -> bool:
+        """Return True if any inverter still has its cached values."""
+        return any(hub.stale for hub in self.hubs.values())
+
+    def seconds_until_next_poll(self) -> float:
+        """Return the time until the next endpoint of any hub is due."""
+        if not self.hubs:
+            return UPDATE_INTERVAL_SECONDS
+        return min(hub.seconds_until_next_poll() for hub in self.hubs.values())
+
+    async def _sweep(self, dongle: Dongle) -> dict[str, dict | Exception]:
+        async with self._semaphore:
+            return await dongle.async_sweep()
+
+    async def fetch_data(self) -> dict:
+        """Fetch data from every inverter of the site."""
+        hubs = list(self.hubs.values())
+        overrun_ms = round(self.coordinator.cycle_overrun * 1000, 1)
+        for hub in hubs:
+            hub.metrics.cycle_overrun_ms = overrun_ms
+        dongles = list(dict.fromkeys(hub.dongle for hub in hubs))
+        sweeps = await asyncio.gather(*(self._sweep(dongle) for dongle in dongles))
+
+        data = self._data
+        for results in sweeps:
+            for hub_id, result in results.items():
+                if isinstance(result, Exception):
+                    # One unreachable inverter only makes its own entities
+                    # unavailable.
+                    _LOGGER.debug("Error updating %s: %s", hub_id, result)
+                    result = {}
+                data[hub_id] = result
+        if hubs and not any(data[hub.hub_id] for hub in hubs):
+            raise ConnectionError("No response from any inverter")
+
+        self._update_totals()
+        return data
+
+    def _sum(
+        self, device_key: str, data_key: str, held: dict[str, float] | None = None
+    ) -> float | None:
+        """Return the sum of one value over every inverter that reported it.
+
+        With held, inverters without a value count with their last one.
+        """
+        data = self._data
+        values = []
+        for hub_id in self.hubs:
+            value = data.get(hub_id, {}).get(device_key, {}).get(data_key)
+            if held is not None:
+                if value is None:
+                    value = held.get(hub_id)
+                else:
+                    held[hub_id] = value
+            if value is not None:
+                values.append(value)
+        return sum(values) if values else None
+
+    def _update_totals(self) -> None:
+        """Sum the per inverter values into the site totals and flows."""
+        totals = self._data[SITE_ID]["site"]
+        for total_key, (device_key, data_key) in SITE_TOTALS.items():
+            totals[total_key] = self._sum(
+                device_key, data_key, self._held.get(total_key)
+            )
+        flows = power_flow(*(self._sum(*value) for value in SITE_FLOW_INPUTS))
+        for key in SITE_FLOWS:
+            totals[key] = flows[key]
@@ -0,0 +1,122 @@
+"""Hourly long-term statistics imported from the sample history."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import PERCENTAGE, UnitOfElectricCurrent, UnitOfPower
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+from .hub import Hub
+from .samples import SAMPLED_VALUES
+
+_LOGGER = logging.getLogger(__name__)
+
+UNITS = {
+    "charge": PERCENTAGE,
+    "current": UnitOfElectricCurrent.AMPERE,
+    "power": UnitOfPower.KILO_WATT,
+    "voltage": "V",
+}
+
+
+class StatisticsImporter:
+    """Write hourly mean/min/max of the sampled values as external statistics.
+
+    The statistics are computed from the hub's sample history, so sensors can
+    write their state at a coarse rate without losing the hourly extremes.
+    """
+
+    def __init__(self, hass: HomeAssistant, hub: Hub) -> None:
+        """Initialize importer."""
+        self._hass = hass
+        self._hub = hub
+        self._unsub: CALLBACK_TYPE | None = None
+
+        descriptions = {
+            (description.device, description.key): description
+            for description in hub.descriptions
+        }
+        device_names = {
+            device_key: device.name for device_key, device in hub.devices.items()
+        }
+        self._metadata = {}
+        for channel, (device, key) in zip(hub.samples.channels, SAMPLED_VALUES):
+            description = descriptions.get((device, key))
+            if description is None:
+                continue
+            self._metadata[channel] = StatisticMetaData(
+                has_mean=True,
+                has_sum=False,
+                name=f"{device_names[device]} {description.name}",
+                source=DOMAIN,
+                statistic_id=f"{DOMAIN}:{slugify(f'{hub.hub_id}_{device}_{key}')}",
+                unit_of_measurement=UNITS[description.kind],
+            )
+
+    @callback
+    def async_start(self) -> None:
+        """Import the statistics of every hour shortly after it ends."""
+        self._unsub = async_track_time_change(
+            self._hass, self._async_import, minute=0, second=10
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop importing statistics."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_import(self, now: datetime) -> None:
+        """Import the statistics of the hour before now."""
+        hour_start = dt_util.as_utc(now).replace(
+            minute=0, second=0, microsecond=0
+        ) - timedelta(hours=1)
+        since = hour_start.timestamp()
+        samples = self._hub.samples
+        if (oldest := samples.oldest) is not None and oldest > since:
+            # Statistics of part of the hour would have the wrong mean, min
+            # and max.
+            if len(samples) == samples.capacity:
+                _LOGGER.warning(
+                    "Sample history of %s does not reach back to %s, not"
+                    " importing its statistics",
+                    self._hub.hub_id,
+                    hour_start,
+                )
+            else:
+                _LOGGER.debug(
+                    "Samples of %s only start within %s", self._hub.hub_id, hour_start
+                )
+            return
+        buckets = [
+            bucket
+            for bucket in samples.downsample(3600, since)
+            if bucket["start"] == since
+        ]
+        if not buckets:
+            _LOGGER.debug("No samples of %s for %s", self._hub.hub_id, hour_start)
+            return
+
+        for channel, stats in buckets[0]["values"].items():
+            if channel not in self._metadata:
+                continue
+            async_add_external_statistics(
+                self._hass,
+                self._metadata[channel],
+                [
+                    StatisticData(
+                        start=hour_start,
+                        mean=stats["mean"],
+                        min=stats["min"],
+                        max=stats["max"],
+                    )
+                ],
+            )
@@ -0,0 +1,62 @@
+"""Platform for switching the power controller on and off."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components.switch import SwitchEntity
+from homeassistant.const import STATE_ON, EntityCategory
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.restore_state import RestoreEntity
+
+from .const import DOMAIN
+from .hub import Hub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    """Add the power control switch of the config entry's inverter."""
+    hub = hass.data[DOMAIN][config_entry.entry_id]
+    # Nothing is written to an inverter without a setting map for its model.
+    if hub.writable:
+        async_add_entities([PowerControlSwitch(hub)])
+
+
+class PowerControlSwitch(SwitchEntity, RestoreEntity):
+    """Runs the closed loop control of the export and import limits."""
+
+    _attr_entity_category = EntityCategory.CONFIG
+    _attr_should_poll = False
+
+    def __init__(self, hub: Hub) -> None:
+        """Initialize switch."""
+        device = hub.devices["inverter"]
+        self._attr_unique_id = f"{hub.hub_id}_inverter_power control"
+        self._attr_name = f"{device.name} Power control"
+        self._attr_device_info = device.device_info
+        self._controller = hub.controller
+
+    async def async_added_to_hass(self) -> None:
+        """Resume control if it was on before a restart."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_state()
+        if last is not None and last.state == STATE_ON:
+            try:
+                await self._controller.async_enable()
+            except HomeAssistantError as err:
+                _LOGGER.warning("Unable to resume power control: %s", err)
+
+    @property
+    def is_on(self) -> bool:
+        """Return True while the controller runs."""
+        return self._controller.enabled
+
+    async def async_turn_on(self, **kwargs) -> None:
+        """Start controlling the grid power."""
+        await self._controller.async_enable()
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs) -> None:
+        """Stop controlling and restore the inverter's own control."""
+        await self._controller.async_disable()
+        self.async_write_ha_state()
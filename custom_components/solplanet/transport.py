@@ -0,0 +1,282 @@
+"""Transports reading the raw payloads of the dongle's endpoints."""
+from __future__ import annotations
+
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util.json import json_loads
+
+from .dongle import async_get_dongle
+
+# Port of the dongle's web server, used when the host does not include one.
+DEFAULT_PORT = 8484
+
+# Endpoints polled from the dongle, mapped to their getdevdata.cgi device
+# number. New endpoints only need an entry here, in POLL_INTERVALS and in
+# hub.WATCHED_FIELDS.
+ENDPOINTS = {
+    "inverter": 2,
+    "meter": 3,
+    "battery": 4,
+}
+
+# "replay" plays back a capture file, given as host, instead, see capture.py.
+TRANSPORTS = ["http", "modbus", "replay"]
+
+# Framings of the Modbus transport: TCP, or RTU on the serial port given as
+# host.
+MODBUS_FRAMINGS = ["tcp", "rtu"]
+
+# Settings that can be written to the inverter, all in W or plain numbers:
+# power_limit caps the inverter's AC output, battery_power is the battery
+# setpoint (positive when discharging) that the inverter follows while
+# battery_mode is 1 instead of 0 (self use).
+SETTINGS = ("power_limit", "battery_power", "battery_mode")
+
+# Keys a setting map gives for each setting, by transport, see
+# load_setting_map.
+SETTING_MAP_KEYS = {
+    "http": {"field": str},
+    "modbus": {"address": int, "count": int, "signed": bool},
+}
+
+
+class TransportError(Exception):
+    """Error to indicate an endpoint could not be read."""
+
+
+def load_setting_map(path: str, transport: str) -> dict[str, dict]:
+    """Return where transport writes each setting, from a setting map file.
+
+    The writable settings differ between models and nothing is written to an
+    inverter without a map verified for its model. A map is a JSON file with
+    one section per transport, e.g.
+
+        {
+            "modbus": {"power_limit": {"address": 1500, "count": 2}},
+            "http": {"power_limit": {"field": "power_limit", "default": 5000}}
+        }
+
+    Modbus settings are holding registers, with a count of 2 for 32 bit
+    values and signed for negative ones; HTTP settings are setting.cgi
+    fields. "default" is the value restored when the power controller stops
+    if the value in effect cannot be read back.
+
+    Does blocking I/O. Raises OSError or ValueError if the file cannot be
+    read or is not a setting map for transport.
+    """
+    with open(path, encoding="utf-8") as file:
+        setting_map = json_loads(file.read())
+    settings = setting_map.get(transport) if isinstance(setting_map, dict) else None
+    if not isinstance(settings, dict) or not settings:
+        raise ValueError(f"No {transport} settings in {path}")
+    keys = SETTING_MAP_KEYS.get(transport, {}) | {"default": int}
+    for setting, spec in settings.items():
+        if setting not in SETTINGS:
+            raise ValueError(f"Unknown setting {setting} in {path}")
+        if (
+            not isinstance(spec, dict)
+            or not set(spec) <= set(keys)
+            or not all(isinstance(spec[key], keys[key]) for key in spec)
+            or not set(keys) - {"count", "signed", "default"} <= set(spec)
+        ):
+            raise ValueError(f"Invalid {setting} in {path}")
+    return settings
+
+
+def load_register_map(path: str) -> dict[str, dict]:
+    """Return the input registers of each field, from a register map file.
+
+    The registers differ between models and firmware versions and no map is
+    shipped; the Modbus transport needs one checked against the inverter's
+    protocol sheet. A map is a JSON file with one section per endpoint,
+    giving the register of each getdevdata.cgi field, in the same units, or
+    a list of them for list fields, e.g.
+
+        {
+            "inverter": {
+                "pac": {"address": 1370, "count": 2, "signed": true},
+                "vac": [{"address": 1358}, {"address": 1360}]
+            }
+        }
+
+    with a count of 2 for 32 bit values, high word first.
+
+    Does blocking I/O. Raises OSError or ValueError if the file cannot be
+    read or is not a register map.
+    """
+    with open(path, encoding="utf-8") as file:
+        register_map = json_loads(file.read())
+    if not isinstance(register_map, dict) or not register_map:
+        raise ValueError(f"No registers in {path}")
+    keys = SETTING_MAP_KEYS["modbus"]
+    for endpoint, fields in register_map.items():
+        if endpoint not in ENDPOINTS or not isinstance(fields, dict):
+            raise ValueError(f"Unknown endpoint {endpoint} in {path}")
+        for field, specs in fields.items():
+            for spec in specs if isinstance(specs, list) and specs else [specs]:
+                if (
+                    not isinstance(spec, dict)
+                    or "address" not in spec
+                    or not set(spec) <= set(keys)
+                    or not all(isinstance(spec[key], keys[key]) for key in spec)
+                    or spec.get("count", 1) not in (1, 2)
+                ):
+                    raise ValueError(f"Invalid {endpoint} {field} in {path}")
+    return register_map
+
+
+def decode_response(status: int, body: bytes) -> tuple[dict[str, Any], int]:
+    """Return the payload of a getdevdata.cgi response and its size.
+
+    Raises TransportError for an HTTP error status or a body that is not JSON.
+    """
+    if status >= 400:
+        raise TransportError(f"HTTP status {status}")
+    try:
+        # Decode the raw body with orjson; the dongle does not send a JSON
+        # content type anyway.
+        return json_loads(body), len(body)
+    except ValueError as err:
+        raise TransportError(err) from err
+
+
+class Transport:
+    """Base class for the ways of reading the dongle's endpoints.
+
+    Every transport returns payloads shaped like the dongle's getdevdata.cgi
+    JSON, so parsing is the same whatever the transport.
+    """
+
+    # Where each setting is written, from a setting map. Without one nothing
+    # is written to the inverter.
+    settings: dict[str, dict] | None = None
+
+    @property
+    def writable(self) -> bool:
+        """Return True if a setting map was configured."""
+        return self.settings is not None
+
+    async def fetch(self, endpoint: str) -> tuple[dict[str, Any], int]:
+        """Return the payload of endpoint and the number of bytes received.
+
+        Raises TransportError if the endpoint could not be read.
+        """
+        raise NotImplementedError
+
+    async def fetch_raw(self, endpoint: str) -> tuple[int, bytes]:
+        """Return the HTTP status and body of endpoint, before decoding.
+
+        Transports that do not read getdevdata.cgi answer with their payload
+        as a JSON body. Raises TransportError if there was no response.
+        """
+        payload, _ = await self.fetch(endpoint)
+        return 200, json_bytes(payload)
+
+    async def write(self, setting: str, value: int) -> None:
+        """Write one of SETTINGS to the inverter.
+
+        Raises TransportError if the setting could not be written.
+        """
+        raise TransportError(f"Writing {setting} is not supported")
+
+    async def read_setting(self, setting: str) -> int:
+        """Return the value of one of SETTINGS in effect on the inverter.
+
+        Raises TransportError if the setting could not be read.
+        """
+        raise TransportError(f"Reading {setting} is not supported")
+
+    async def close(self) -> None:
+        """Release the connection to the dongle."""
+
+
+class HttpTransport(Transport):
+    """getdevdata.cgi JSON over HTTP."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        host: str,
+        inverter_id: str,
+        settings: dict[str, dict] | None = None,
+    ) -> None:
+        """Initialize transport."""
+        self._session = session
+        self.settings = settings
+        self._inverter_id = inverter_id
+        base_url = f"http://{host}" if ":" in host else f"http://{host}:{DEFAULT_PORT}"
+        self._setting_url = f"{base_url}/setting.cgi"
+        self._urls = {
+            endpoint: f"{base_url}/getdevdata.cgi?device={device}&sn={inverter_id}"
+            for endpoint, device in ENDPOINTS.items()
+        }
+
+    async def fetch(self, endpoint: str) -> tuple[dict[str, Any], int]:
+        """Return the payload of endpoint and the number of bytes received."""
+        return decode_response(*await self.fetch_raw(endpoint))
+
+    async def fetch_raw(self, endpoint: str) -> tuple[int, bytes]:
+        """Return the HTTP status and body of endpoint."""
+        try:
+            async with self._session.get(self._urls[endpoint]) as response:
+                return response.status, await response.read()
+        except aiohttp.ClientError as err:
+            raise TransportError(err) from err
+
+    async def write(self, setting: str, value: int) -> None:
+        """Write one of SETTINGS to its setting.cgi field."""
+        if self.settings is None or setting not in self.settings:
+            raise TransportError(f"No {setting} in the setting map")
+        field = self.settings[setting]["field"]
+        try:
+            async with self._session.post(
+                self._setting_url,
+                json={"device": 2, "sn": self._inverter_id, field: value},
+            ) as response:
+                response.raise_for_status()
+        except aiohttp.ClientError as err:
+            raise TransportError(err) from err
+
+
+def create_transport(
+    hass: HomeAssistant,
+    data: dict,
+    settings: dict[str, dict] | None = None,
+    registers: dict[str, dict] | None = None,
+) -> Transport:
+    """Return the transport configured in the config entry data.
+
+    settings are the transport's section of the setting map, if configured,
+    and registers the register map the Modbus transport reads.
+    """
+    if data.get("transport") == "modbus":
+        # Only import pymodbus for inverters that use it.
+        from .modbus import (  # pylint: disable=import-outside-toplevel
+            ModbusConnection,
+            ModbusTransport,
+        )
+
+        # Every unit on the dongle's bus goes through the same connection.
+        connections = async_get_dongle(hass, data["host"]).connections
+        key = ("modbus", data["host"])
+        if (connection := connections.get(key)) is None:
+            connection = connections[key] = ModbusConnection(
+                data["host"], data.get("modbus_framing", "tcp")
+            )
+        return ModbusTransport(
+            connection, data.get("modbus_unit", 3), registers or {}, settings
+        )
+    if data.get("transport") == "replay":
+        from .capture import ReplayTransport  # pylint: disable=import-outside-toplevel
+
+        return ReplayTransport(
+            hass, hass.config.path(data["host"]), data["inverter_id"]
+        )
+    return HttpTransport(
+        async_get_clientsession(hass), data["host"], data["inverter_id"], settings
+    )
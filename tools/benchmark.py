@@ -0,0 +1,120 @@
+"""Load benchmark for Hub.fetch_data against the local dongle simulator.
+
+Polls N simulated inverters the way the site coordinator does and reports
+poll latency percentiles, throughput and allocations per poll cycle.
+
+    python tools/benchmark.py --inverters 8 --cycles 200 --latency 300
+
+Requires Home Assistant to be importable (the hub imports its helpers), e.g.
+from a Home Assistant development environment.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.solplanet.const import MAX_CONCURRENT_POLLS  # noqa: E402
+from custom_components.solplanet.hub import Hub  # noqa: E402
+from simulator import (  # noqa: E402
+    add_simulator_arguments,
+    config_from_arguments,
+    start_simulator,
+)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Return the nearest rank percentile of samples."""
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark."""
+    simulator, runner = await start_simulator(
+        config_from_arguments(args), port=args.port
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def poll(hub: Hub) -> float:
+        async with semaphore:
+            # Benchmark full polls rather than the adaptive schedule.
+            for schedule in hub._schedules.values():  # noqa: SLF001
+                schedule.next_poll = 0
+            start = time.perf_counter()
+            try:
+                await hub.fetch_data()
+            except ConnectionError:
+                pass
+            return time.perf_counter() - start
+
+    # Hubs on the same dongle share its request gate, kept in hass.data.
+    hass = HomeAssistant(tempfile.mkdtemp())
+    async with aiohttp.ClientSession() as session:
+        hubs = [
+            Hub(hass, f"127.0.0.1:{args.port}", serial, session=session)
+            for serial in simulator.inverters
+        ]
+
+        # Warm up the connection pool before measuring.
+        await asyncio.gather(*(poll(hub) for hub in hubs))
+
+        poll_latencies = []
+        cycle_latencies = []
+        cycle_allocations = []
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in range(args.cycles):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            cycle_start = time.perf_counter()
+            poll_latencies += await asyncio.gather(*(poll(hub) for hub in hubs))
+            cycle_latencies.append(time.perf_counter() - cycle_start)
+            cycle_allocations.append(tracemalloc.get_traced_memory()[1] - baseline)
+        elapsed = time.perf_counter() - started
+        tracemalloc.stop()
+
+    await runner.cleanup()
+
+    polls = len(poll_latencies)
+    print(f"inverters:         {len(hubs)}")
+    print(f"cycles:            {args.cycles}")
+    print(f"dongle requests:   {simulator.requests}")
+    for label, samples in (("poll", poll_latencies), ("cycle", cycle_latencies)):
+        print(
+            f"{label + ' latency:':<19}"
+            f"p50 {percentile(samples, 0.5) * 1000:.1f} ms  "
+            f"p90 {percentile(samples, 0.9) * 1000:.1f} ms  "
+            f"p99 {percentile(samples, 0.99) * 1000:.1f} ms  "
+            f"max {max(samples) * 1000:.1f} ms"
+        )
+    print(f"throughput:        {polls / elapsed:.1f} polls/s")
+    print(
+        f"peak alloc/cycle:  mean {statistics.mean(cycle_allocations) / 1024:.1f} KiB"
+        f"  max {max(cycle_allocations) / 1024:.1f} KiB"
+    )
+
+
+def main() -> None:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18484)
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_POLLS)
+    add_simulator_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
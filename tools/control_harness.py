@@ -0,0 +1,139 @@
+"""Closed loop test of the power controller against the simulated plant.
+
+Runs a hub and its PowerController against the dongle simulator, with the
+sun fixed so there is surplus to export, and reports how the grid power
+settles on the export and import limits and how many setpoints were written.
+Exits with an error if the grid power does not settle within --max-settle
+seconds. The plant is seeded and without cloud or load noise by default, so
+runs are repeatable; pass --noise 1 for the simulator's usual noise.
+
+    python tools/control_harness.py --export-limit 0 --seconds 30
+    python tools/control_harness.py --sun 0 --import-limit 0.2 --seconds 30
+
+Requires Home Assistant to be importable (the hub imports its helpers), e.g.
+from a Home Assistant development environment.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.aiohttp_client import (  # noqa: E402
+    async_get_clientsession,
+)
+
+from custom_components.solplanet.control import PowerController  # noqa: E402
+from custom_components.solplanet.hub import Hub  # noqa: E402
+from custom_components.solplanet.transport import HttpTransport  # noqa: E402
+from simulator import (  # noqa: E402
+    SETTING_MAP,
+    add_simulator_arguments,
+    config_from_arguments,
+    start_simulator,
+)
+
+
+async def run(args: argparse.Namespace) -> bool:
+    """Run the harness, returning whether the grid power settled in time."""
+    simulator, runner = await start_simulator(
+        config_from_arguments(args), port=args.port
+    )
+    serial, plant = next(iter(simulator.inverters.items()))
+    hass = HomeAssistant(tempfile.mkdtemp())
+    host = f"127.0.0.1:{args.port}"
+    transport = HttpTransport(
+        async_get_clientsession(hass), host, serial, SETTING_MAP["http"]
+    )
+    hub = Hub(hass, host, serial, transport=transport)
+
+    writes = []
+    write = hub.async_write
+
+    async def counting_write(setting: str, value: int) -> None:
+        writes.append((time.monotonic(), setting, value))
+        await write(setting, value)
+
+    hub.async_write = counting_write
+    controller = PowerController(hass, hub, args.rated_power)
+    controller.export_limit = (
+        None if args.export_limit is None else args.export_limit * 1000
+    )
+    controller.import_limit = (
+        None if args.import_limit is None else args.import_limit * 1000
+    )
+
+    await hub.fetch_data()
+    await controller.async_enable()
+    started = time.monotonic()
+    trace = []
+    while (elapsed := time.monotonic() - started) < args.seconds:
+        await asyncio.sleep(max(hub.seconds_until_next_poll(), 0.05))
+        try:
+            await hub.fetch_data()
+        except ConnectionError:
+            continue
+        trace.append((elapsed, plant.grid_power, plant.ac_power, plant.battery_power))
+    await controller.async_disable()
+    await runner.cleanup()
+
+    print(f"{'t (s)':>6} {'grid (W)':>9} {'inverter (W)':>13} {'battery (W)':>12}")
+    for elapsed, grid, ac_power, battery in trace[:: max(len(trace) // 20, 1)]:
+        print(f"{elapsed:6.1f} {grid:9.0f} {ac_power:13.0f} {battery:12.0f}")
+
+    # Seconds until the grid power stays within 100 W of the limits.
+    def violation(grid: float) -> float:
+        excess = 0.0
+        if controller.export_limit is not None:
+            excess = max(excess, -grid - controller.export_limit)
+        if controller.import_limit is not None:
+            excess = max(excess, grid - controller.import_limit)
+        return excess
+
+    settled = next(
+        (
+            elapsed
+            for index, (elapsed, *_) in enumerate(trace)
+            if all(violation(grid) <= 100 for _, grid, *_ in trace[index:])
+        ),
+        None,
+    )
+    tail = [
+        violation(grid) for elapsed, grid, *_ in trace if elapsed > args.seconds / 2
+    ]
+    print()
+    print(f"settled after:     {'never' if settled is None else f'{settled:.1f} s'}")
+    if tail:
+        print(
+            f"violation (2nd half): mean {statistics.fmean(tail):.0f} W"
+            f"  max {max(tail):.0f} W"
+        )
+    print(f"setpoint writes:   {len(writes)} ({len(writes) / args.seconds:.2f}/s)")
+    await hass.async_stop(force=True)
+    return settled is not None and settled <= args.max_settle
+
+
+def main() -> None:
+    """Run the harness from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18484)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--export-limit", type=float, help="kW")
+    parser.add_argument("--import-limit", type=float, help="kW")
+    parser.add_argument("--rated-power", type=float, default=5000, help="W")
+    parser.add_argument("--max-settle", type=float, default=2, help="seconds")
+    add_simulator_arguments(parser)
+    parser.set_defaults(sun=0.9, seed=1, noise=0)
+    if not asyncio.run(run(parser.parse_args())):
+        sys.exit("Grid power did not settle within --max-settle seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Replay captured dongle responses through the hubs, coordinator and sensors.
+
+Feeds capture files, recorded with the "Capture the dongle's responses"
+option, through the same Hub, site Coordinator and sensor entities as Home
+Assistant, without a dongle. By default the capture is stepped through as
+fast as possible, one poll at a time, and the time per poll is reported;
+with --realtime it plays at the speed it was recorded.
+
+    python tools/replay.py solplanet_capture_sn123.jsonl
+    python tools/replay.py capture.jsonl --dump after.jsonl
+
+--dump writes the parsed values after every poll, one JSON line per poll,
+so a parsing change can be checked by diffing the dumps of two versions.
+Poll timings, and energy values that may be integrated from power, depend
+on the replay's timing and are left out.
+
+Requires Home Assistant to be importable (the hub imports its helpers), e.g.
+from a Home Assistant development environment.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.solplanet.capture import (  # noqa: E402
+    ReplayTransport,
+    load_capture,
+)
+from custom_components.solplanet.dongle import (  # noqa: E402
+    RequestGate,
+    async_get_dongle,
+)
+from custom_components.solplanet.energy import INTEGRATED_ENERGY  # noqa: E402
+from custom_components.solplanet.hub import Hub  # noqa: E402
+from custom_components.solplanet.sensor_initialization import (  # noqa: E402
+    create_sensors,
+)
+from custom_components.solplanet.site import Site  # noqa: E402
+from custom_components.solplanet.transport import ENDPOINTS  # noqa: E402
+
+
+# (device, key) of the values that differ with the replay's timing.
+TIMED_VALUES = {
+    ("inverter", "poll_duration"),
+    ("inverter", "cycle_overrun"),
+    *(("inverter", f"latency_{endpoint}") for endpoint in ENDPOINTS),
+    *((device, key) for device, key, _ in INTEGRATED_ENERGY),
+}
+
+
+def dump_values(data: dict[str, dict]) -> dict[str, dict]:
+    """Return the values of one hub that only depend on the capture."""
+    return {
+        device: {
+            key: value
+            for key, value in values.items()
+            if (device, key) not in TIMED_VALUES
+        }
+        for device, values in data.items()
+    }
+
+
+def poll_steps(records: list[dict]) -> list[tuple[float, str, set[str]]]:
+    """Split the records into the polls they came from.
+
+    Returns (time of the last response, serial, endpoints) for every poll.
+    A poll is a run of responses of one inverter without a repeated
+    endpoint, as one sweep of the dongle reads them.
+    """
+    steps: list[tuple[float, str, set[str]]] = []
+    for record in records:
+        serial = record["sn"].lower()
+        if steps and steps[-1][1] == serial and record["ep"] not in steps[-1][2]:
+            steps[-1] = (record["t"], serial, steps[-1][2] | {record["ep"]})
+        else:
+            steps.append((record["t"], serial, {record["ep"]}))
+    return steps
+
+
+def set_due(hubs: dict[str, Hub], serial: str | None, endpoints: set[str]) -> None:
+    """Make endpoints of the hub of serial due, and nothing else."""
+    for hub_id, hub in hubs.items():
+        for endpoint, schedule in hub._schedules.items():  # noqa: SLF001
+            due = hub_id == serial and endpoint in endpoints
+            schedule.next_poll = 0 if due else math.inf
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Return the nearest rank percentile of samples."""
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the replay."""
+    hass = HomeAssistant(tempfile.mkdtemp())
+    site = Site(hass)
+    hubs: dict[str, Hub] = {}
+    transports: dict[str, ReplayTransport] = {}
+    records = []
+    for path in args.captures:
+        capture = load_capture(path)
+        records += capture
+        # Nothing to wait for between requests to a file.
+        async_get_dongle(hass, path).gate = RequestGate(0)
+        for serial in dict.fromkeys(record["sn"] for record in capture):
+            transport = ReplayTransport(hass, path, serial, realtime=args.realtime)
+            hub = Hub(hass, path, serial, transport=transport)
+            hubs[hub.hub_id] = hub
+            transports[hub.hub_id] = transport
+            site.add_hub(hub)
+    records.sort(key=lambda record: record["t"])
+    if not records:
+        print("No responses in the capture")
+        return
+
+    # The entities as the sensor platform creates them, attached to the
+    # coordinator without a platform.
+    logging.getLogger("homeassistant.helpers.entity").setLevel(logging.ERROR)
+    entities = []
+    for hub in hubs.values():
+        entities += create_sensors(hub, site.coordinator, hub.descriptions)
+    for index, entity in enumerate(entities):
+        entity.hass = hass
+        entity.entity_id = f"sensor.replay_{index}"
+        site.coordinator.async_add_listener(entity._handle_coordinator_update)
+    writes = 0
+
+    def count_write(_) -> None:
+        nonlocal writes
+        writes += 1
+
+    hass.bus.async_listen("state_changed", count_write)
+
+    dump = open(args.dump, "w", encoding="utf-8") if args.dump else None
+    latencies = []
+    started = time.perf_counter()
+    if args.realtime:
+        end = time.monotonic() + records[-1]["t"] - records[0]["t"]
+        while time.monotonic() < end:
+            start = time.perf_counter()
+            await site.coordinator.async_refresh()
+            latencies.append(time.perf_counter() - start)
+            if dump:
+                values = {
+                    hub_id: dump_values(hub.data) for hub_id, hub in hubs.items()
+                }
+                dump.write(json.dumps(values) + "\n")
+            await asyncio.sleep(max(site.seconds_until_next_poll(), 0.05))
+    else:
+        for now, serial, endpoints in poll_steps(records):
+            # Poll exactly what was polled at this point of the capture, and
+            # nothing in the coordinator's own refreshes in between.
+            for transport in transports.values():
+                transport.now = now
+            set_due(hubs, serial, endpoints)
+            start = time.perf_counter()
+            await site.coordinator.async_refresh()
+            latencies.append(time.perf_counter() - start)
+            set_due(hubs, None, set())
+            if dump:
+                values = {serial: dump_values(hubs[serial].data)}
+                dump.write(json.dumps(values) + "\n")
+        await hass.async_block_till_done()
+    elapsed = time.perf_counter() - started
+    if dump:
+        dump.close()
+
+    print(f"inverters:         {len(hubs)}")
+    print(f"responses:         {len(records)}")
+    print(f"polls:             {len(latencies)}")
+    print(
+        f"poll latency:      p50 {percentile(latencies, 0.5) * 1000:.2f} ms  "
+        f"p90 {percentile(latencies, 0.9) * 1000:.2f} ms  "
+        f"max {max(latencies) * 1000:.2f} ms  "
+        f"mean {statistics.mean(latencies) * 1000:.2f} ms"
+    )
+    print(f"throughput:        {len(latencies) / elapsed:.1f} polls/s")
+    print(f"entities:          {len(entities)}")
+    print(f"state writes:      {writes}")
+    await hass.async_stop(force=True)
+
+
+def main() -> None:
+    """Parse arguments and run the replay."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("captures", nargs="+", help="capture files")
+    parser.add_argument(
+        "--realtime", action="store_true", help="play at the recorded speed"
+    )
+    parser.add_argument("--dump", help="write the parsed values after every poll")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
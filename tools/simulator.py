@@ -0,0 +1,565 @@
+"""Local stand-in for the Solplanet/AISWEI WiFi dongle web server.
+
+Serves getdevdata.cgi style inverter, meter and battery JSON for any number
+of simulated inverters, with configurable latency, jitter and error rates.
+
+    python tools/simulator.py --inverters 4 --latency 300 --jitter 200
+
+Point the integration (or tools/benchmark.py) at 127.0.0.1:8484 and use one
+of the serial numbers printed at startup. With --modbus-port the same
+inverters are also served over Modbus TCP, as unit addresses 3, 4, ...
+(this needs pymodbus and Home Assistant importable for the register map).
+
+Values follow the dongle's scaling: voltages in 0.1 V (0.01 V for the
+battery), currents in 0.1 A, energies in 0.1 kWh and power in W. Meter power is
+positive when importing from the grid and battery power is positive when
+discharging.
+
+Settings written with POST /setting.cgi (or the Modbus holding registers)
+curtail the PV output to power_limit and, with battery_mode 1, make the
+battery follow battery_power, so the power controller can be run against it
+(see tools/control_harness.py). --setting-map writes the simulator's setting
+map, for enabling power control in the integration against it, and
+--register-map its Modbus register map, for the Modbus transport.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import json
+import math
+from pathlib import Path
+import random
+import sys
+import time
+
+from aiohttp import web
+
+DEFAULT_PORT = 8484
+FIRST_MODBUS_UNIT = 3
+RATED_POWER = 5000
+
+# Where the simulator takes the settings, as a setting map for the integration.
+SETTING_MAP = {
+    "http": {
+        "power_limit": {"field": "power_limit", "default": RATED_POWER},
+        "battery_power": {"field": "battery_power", "default": 0},
+        "battery_mode": {"field": "battery_mode", "default": 0},
+    },
+    "modbus": {
+        "power_limit": {"address": 1500, "count": 2},
+        "battery_power": {"address": 1502, "count": 2, "signed": True},
+        "battery_mode": {"address": 1504},
+    },
+}
+
+# Input registers the simulator serves over Modbus, in the format of a
+# register map file (made up, like SETTING_MAP, not a real inverter's).
+REGISTER_MAP = {
+    "inverter": {
+        "vpv": [{"address": 1319}, {"address": 1321}],
+        "ipv": [{"address": 1320}, {"address": 1322}],
+        "eto": {"address": 1335, "count": 2},
+        "etd": {"address": 1337, "count": 2},
+        "vac": [{"address": 1358}, {"address": 1360}, {"address": 1362}],
+        "iac": [{"address": 1359}, {"address": 1361}, {"address": 1363}],
+        "pac": {"address": 1370, "count": 2, "signed": True},
+    },
+    "battery": {
+        "vb": {"address": 1604},
+        "cb": {"address": 1605, "signed": True},
+        "pb": {"address": 1606, "count": 2, "signed": True},
+        "soc": {"address": 1608},
+        "ebi": {"address": 1610, "count": 2},
+        "ebo": {"address": 1612, "count": 2},
+        "ppv": {"address": 1614, "count": 2},
+    },
+    "meter": {
+        "pac": {"address": 1640, "count": 2, "signed": True},
+        "iet": {"address": 1642, "count": 2},
+        "oet": {"address": 1644, "count": 2},
+    },
+}
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated dongle."""
+
+    inverters: int = 1
+    latency: float = 0.0  # Mean response delay in seconds.
+    jitter: float = 0.0  # Uniform +- spread added to latency in seconds.
+    error_rate: float = 0.0  # Share of requests answered with HTTP 500.
+    timeout_rate: float = 0.0  # Share of requests that never get an answer.
+    malformed_rate: float = 0.0  # Share of requests answered with broken JSON.
+    seed: int | None = None
+    sun: float | None = None  # Fixed share of peak sun instead of the clock.
+    noise: float = 1.0  # Scale of the cloud and house load noise, 0 for none.
+
+
+class SimulatedInverter:
+    """One hybrid inverter with two PV strings, a meter and a battery."""
+
+    def __init__(
+        self,
+        serial: str,
+        rng: random.Random,
+        sun: float | None = None,
+        noise: float = 1.0,
+    ) -> None:
+        """Initialize simulated inverter."""
+        self.serial = serial
+        self._rng = rng
+        self._sun = sun
+        self._noise = noise
+        self._rated_power = RATED_POWER
+        # Settings written through setting.cgi or the holding registers.
+        self.power_limit: int | None = None
+        self.battery_mode = 0
+        self.battery_setpoint = 0
+        self.load_power = rng.uniform(300, 1500)
+        self._started = time.monotonic()
+        self._last_update = self._started
+        self._soc = rng.uniform(20, 90)
+        # Energy counters in Wh.
+        self._pv_energy = rng.uniform(1e6, 5e6)
+        self._battery_in = rng.uniform(1e5, 1e6)
+        self._battery_out = self._battery_in * 0.9
+        self._grid_import = rng.uniform(1e6, 3e6)
+        self._grid_export = rng.uniform(1e6, 3e6)
+        self._update()
+
+    def _update(self) -> None:
+        """Advance the simulated plant to the current time."""
+        now = time.monotonic()
+        seconds = now - self._last_update
+        hours = seconds / 3600
+        self._last_update = now
+
+        # Solar output follows the local time of day with some cloud noise.
+        if self._sun is None:
+            clock = time.localtime()
+            day_fraction = (
+                clock.tm_hour * 3600 + clock.tm_min * 60 + clock.tm_sec
+            ) / 86400
+            sun = max(math.sin((day_fraction - 0.25) * 2 * math.pi), 0)
+        else:
+            sun = self._sun
+        cloud = 1 - self._rng.uniform(0, 0.2 * self._noise)
+        self.pv_power = [
+            self._rated_power * 0.5 * sun * cloud,
+            self._rated_power * 0.45 * sun * cloud,
+        ]
+        pv_total = sum(self.pv_power)
+
+        # The house load wanders around slowly, by about 100 W per second
+        # however often the plant is updated.
+        drift = self._rng.gauss(0, 100 * self._noise * math.sqrt(seconds))
+        self.load_power = min(max(self.load_power + drift, 300), 3000)
+        surplus = pv_total - self.load_power
+        if self.battery_mode == 1:
+            # The battery follows the written setpoint.
+            setpoint = min(max(self.battery_setpoint, -2500), 2500)
+            if (setpoint > 0 and self._soc <= 10) or (
+                setpoint < 0 and self._soc >= 100
+            ):
+                setpoint = 0
+            self.battery_power = float(setpoint)
+        # Otherwise it absorbs surplus and covers deficit within its limits.
+        elif surplus > 0 and self._soc < 100:
+            self.battery_power = -min(surplus, 2500)
+        elif surplus < 0 and self._soc > 10:
+            self.battery_power = min(-surplus, 2500)
+        else:
+            self.battery_power = 0.0
+        if (
+            self.power_limit is not None
+            and pv_total + self.battery_power > self.power_limit
+        ):
+            # Curtail the PV strings to stay within the power limit.
+            scale = max(self.power_limit - self.battery_power, 0) / pv_total
+            self.pv_power = [power * scale for power in self.pv_power]
+            pv_total = sum(self.pv_power)
+        self.grid_power = self.load_power - pv_total - self.battery_power
+        self.ac_power = pv_total + self.battery_power
+
+        self._soc = min(max(self._soc - self.battery_power * hours / 100, 0), 100)
+        self._pv_energy += pv_total * hours
+        if self.battery_power > 0:
+            self._battery_out += self.battery_power * hours
+        else:
+            self._battery_in -= self.battery_power * hours
+        if self.grid_power > 0:
+            self._grid_import += self.grid_power * hours
+        else:
+            self._grid_export -= self.grid_power * hours
+
+    def write(self, setting: str, value: int) -> None:
+        """Apply a written setting."""
+        if setting == "power_limit":
+            self.power_limit = value
+        elif setting == "battery_power":
+            self.battery_setpoint = value
+        elif setting == "battery_mode":
+            self.battery_mode = value
+        self._update()
+
+    def inverter_payload(self) -> dict:
+        """Return a getdevdata.cgi?device=2 payload."""
+        self._update()
+        vac = self._rng.uniform(2280, 2420)
+        return {
+            "flg": 1,
+            "tim": time.strftime("%Y%m%d%H%M%S"),
+            "tmp": int(self._rng.uniform(300, 450)),
+            "fac": int(self._rng.uniform(4990, 5010)),
+            "pac": int(self.ac_power),
+            "sac": int(abs(self.ac_power)),
+            "qac": 0,
+            "eto": int(self._pv_energy / 100),
+            "etd": int(self._pv_energy / 100) % 500,
+            "hto": int((time.monotonic() - self._started) / 3600),
+            "pf": 100,
+            "wan": 0,
+            "err": 0,
+            "vac": [int(vac), int(vac + 15), int(vac - 12)],
+            "iac": [int(abs(self.ac_power) / 3 / vac * 100)] * 3,
+            "vpv": [int(3400 + power / 10) if power else 0 for power in self.pv_power],
+            "ipv": [
+                int(power / (340 + power / 100) * 10) if power else 0
+                for power in self.pv_power
+            ],
+            "str": [],
+            "stu": 1 if self.ac_power else 0,
+        }
+
+    def meter_payload(self) -> dict:
+        """Return a getdevdata.cgi?device=3 payload."""
+        self._update()
+        return {
+            "flg": 1,
+            "tim": time.strftime("%Y%m%d%H%M%S"),
+            "pac": int(self.grid_power),
+            "itd": int(self._grid_import / 100) % 500,
+            "otd": int(self._grid_export / 100) % 500,
+            "iet": int(self._grid_import / 100),
+            "oet": int(self._grid_export / 100),
+            "mod": 1,
+            "enb": 1,
+        }
+
+    def battery_payload(self) -> dict:
+        """Return a getdevdata.cgi?device=4 payload."""
+        self._update()
+        voltage = 4800 + self._soc * 5
+        return {
+            "flg": 1,
+            "tim": time.strftime("%Y%m%d%H%M%S"),
+            "ppv": int(sum(self.pv_power)),
+            "etdpv": int(self._pv_energy / 100) % 500,
+            "etopv": int(self._pv_energy / 100),
+            "cst": 0,
+            "bst": 1,
+            "vb": int(voltage),
+            "cb": int(self.battery_power / voltage * 1000),
+            "pb": int(self.battery_power),
+            "tb": int(self._rng.uniform(200, 300)),
+            "soc": int(self._soc),
+            "soh": 100,
+            "cli": 500,
+            "clo": 500,
+            "ebi": int(self._battery_in / 100),
+            "ebo": int(self._battery_out / 100),
+        }
+
+
+class Simulator:
+    """HTTP front end of the simulated dongle."""
+
+    def __init__(self, config: SimulatorConfig) -> None:
+        """Initialize simulator."""
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self.inverters = {
+            serial: SimulatedInverter(serial, self._rng, config.sun, config.noise)
+            for serial in (f"SIM{index:07d}" for index in range(config.inverters))
+        }
+        self.requests = 0
+
+    def create_app(self) -> web.Application:
+        """Return the aiohttp application serving the dongle API."""
+        app = web.Application()
+        app.router.add_get("/getdevdata.cgi", self._handle_getdevdata)
+        app.router.add_get("/getdev.cgi", self._handle_getdev)
+        app.router.add_post("/setting.cgi", self._handle_setting)
+        return app
+
+    async def _respond(self, payload: dict) -> web.Response:
+        """Apply latency and fault injection to a response."""
+        self.requests += 1
+        config = self.config
+        delay = config.latency + self._rng.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        roll = self._rng.random()
+        if roll < config.timeout_rate:
+            await asyncio.sleep(3600)
+        roll -= config.timeout_rate
+        if roll < config.error_rate:
+            return web.Response(status=500, text="Internal Server Error")
+        roll -= config.error_rate
+        if roll < config.malformed_rate:
+            return web.Response(text=json.dumps(payload)[:-7], content_type="text/html")
+        # The dongle answers with text/html, not application/json.
+        return web.Response(text=json.dumps(payload), content_type="text/html")
+
+    async def _handle_getdevdata(self, request: web.Request) -> web.Response:
+        inverter = self.inverters.get(request.query.get("sn", ""))
+        device = request.query.get("device")
+        if inverter is None or device not in ("2", "3", "4"):
+            return await self._respond({})
+        if device == "2":
+            return await self._respond(inverter.inverter_payload())
+        if device == "3":
+            return await self._respond(inverter.meter_payload())
+        return await self._respond(inverter.battery_payload())
+
+    async def _handle_setting(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        inverter = self.inverters.get(str(body.get("sn", "")))
+        if inverter is None:
+            return web.Response(status=404)
+        for setting in ("power_limit", "battery_power", "battery_mode"):
+            if setting in body:
+                inverter.write(setting, int(body[setting]))
+        return await self._respond({"dat": "ok"})
+
+    async def _handle_getdev(self, request: web.Request) -> web.Response:
+        device = request.query.get("device")
+        if device == "0":
+            return await self._respond(
+                {
+                    "psn": "SIMDONGLE",
+                    "typ": 5,
+                    "nam": "Wi-Fi Stick",
+                    "mod": "B",
+                    "muf": "AISWEI",
+                    "brd": "AISWEI",
+                    "hw": "M11",
+                    "sw": "21618-006R",
+                    "tim": time.strftime("%Y%m%d%H%M%S"),
+                    "status": 1,
+                }
+            )
+        if device == "2":
+            return await self._respond(
+                {
+                    "inv": [
+                        {"isn": serial, "add": index + 3, "model": "ASW5000H-S"}
+                        for index, serial in enumerate(self.inverters)
+                    ],
+                    "num": len(self.inverters),
+                }
+            )
+        return await self._respond({})
+
+
+async def start_simulator(
+    config: SimulatorConfig, host: str = "127.0.0.1", port: int = DEFAULT_PORT
+) -> tuple[Simulator, web.AppRunner]:
+    """Start a simulator in the running event loop."""
+    simulator = Simulator(config)
+    runner = web.AppRunner(simulator.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return simulator, runner
+
+
+def _encode_registers(registers, payload: dict) -> list[tuple[int, list[int]]]:
+    """Return (address, register values) writes holding payload."""
+    writes = []
+    for register in registers:
+        value = payload.get(register.field)
+        if register.index is not None:
+            value = value[register.index] if value else None
+        if value is None:
+            continue
+        value = int(value) & ((1 << 16 * register.count) - 1)
+        if register.count == 2:
+            writes.append((register.address, [value >> 16, value & 0xFFFF]))
+        else:
+            writes.append((register.address, [value]))
+    return writes
+
+
+async def start_modbus_simulator(
+    simulator: Simulator, host: str, port: int
+) -> asyncio.Task:
+    """Serve the simulated inverters over Modbus TCP in the running loop."""
+    # pylint: disable=import-outside-toplevel
+    from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext
+
+    try:
+        from pymodbus.datastore import ModbusDeviceContext
+    except ImportError:
+        # Named ModbusSlaveContext before pymodbus 3.10.
+        from pymodbus.datastore import ModbusSlaveContext as ModbusDeviceContext
+    from pymodbus.server import StartAsyncTcpServer
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from custom_components.solplanet.modbus import Register, registers_from_map
+
+    input_registers = registers_from_map(REGISTER_MAP)
+
+    setting_registers = {
+        setting: Register(
+            "setting",
+            setting,
+            spec["address"],
+            spec.get("count", 1),
+            spec.get("signed", False),
+        )
+        for setting, spec in SETTING_MAP["modbus"].items()
+    }
+    size = (
+        max(
+            register.address + register.count
+            for register in (*input_registers, *setting_registers.values())
+        )
+        + 1
+    )
+    stores = {
+        FIRST_MODBUS_UNIT + index: ModbusDeviceContext(
+            ir=ModbusSequentialDataBlock(0, [0] * size),
+            hr=ModbusSequentialDataBlock(0, [0] * size),
+        )
+        for index in range(len(simulator.inverters))
+    }
+    # The settings in effect before anything is written.
+    defaults = {
+        setting: spec["default"] for setting, spec in SETTING_MAP["http"].items()
+    }
+    for store in stores.values():
+        for address, values in _encode_registers(
+            setting_registers.values(), defaults
+        ):
+            store.setValues(3, address, values)
+    written: dict[tuple[int, str], list[int]] = {}
+    context = ModbusServerContext(stores, single=False)
+
+    async def update_registers() -> None:
+        while True:
+            for unit, inverter in zip(stores, simulator.inverters.values()):
+                # Apply settings whose holding registers changed.
+                for setting, register in setting_registers.items():
+                    values = stores[unit].getValues(3, register.address, register.count)
+                    if values != written.setdefault((unit, setting), values):
+                        written[unit, setting] = values
+                        value = 0
+                        for word in values:
+                            value = value << 16 | word
+                        if register.signed and value >= 1 << (16 * register.count - 1):
+                            value -= 1 << (16 * register.count)
+                        inverter.write(setting, value)
+                payloads = {
+                    "inverter": inverter.inverter_payload(),
+                    "meter": inverter.meter_payload(),
+                    "battery": inverter.battery_payload(),
+                }
+                for endpoint, payload in payloads.items():
+                    registers = [r for r in input_registers if r.endpoint == endpoint]
+                    for address, values in _encode_registers(registers, payload):
+                        stores[unit].setValues(4, address, values)
+            await asyncio.sleep(1)
+
+    async def serve() -> None:
+        updater = asyncio.create_task(update_registers())
+        try:
+            await StartAsyncTcpServer(context=context, address=(host, port))
+        finally:
+            updater.cancel()
+
+    task = asyncio.create_task(serve())
+    # Give the server a moment to bind before clients connect.
+    await asyncio.sleep(0.1)
+    return task
+
+
+def add_simulator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the simulator options to an argument parser."""
+    parser.add_argument("--inverters", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--timeout-rate", type=float, default=0)
+    parser.add_argument("--malformed-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--sun", type=float, help="fixed share of peak sun, 0-1, instead of the clock"
+    )
+    parser.add_argument(
+        "--noise", type=float, default=1, help="scale of the cloud and load noise"
+    )
+
+
+def config_from_arguments(args: argparse.Namespace) -> SimulatorConfig:
+    """Build a simulator config from parsed arguments."""
+    return SimulatorConfig(
+        inverters=args.inverters,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+        sun=args.sun,
+        noise=args.noise,
+    )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    simulator, runner = await start_simulator(
+        config_from_arguments(args), args.host, args.port
+    )
+    if args.setting_map:
+        with open(args.setting_map, "w", encoding="utf-8") as file:
+            json.dump(SETTING_MAP, file, indent=2)
+    if args.register_map:
+        with open(args.register_map, "w", encoding="utf-8") as file:
+            json.dump(REGISTER_MAP, file, indent=2)
+    print(f"Simulated dongle on {args.host}:{args.port}")
+    if args.modbus_port:
+        await start_modbus_simulator(simulator, args.host, args.modbus_port)
+        print(f"Modbus TCP on {args.host}:{args.modbus_port}")
+    for index, serial in enumerate(simulator.inverters):
+        print(f"  inverter {serial} (Modbus unit {FIRST_MODBUS_UNIT + index})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    """Run the simulator until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--modbus-port", type=int, help="also serve Modbus TCP")
+    parser.add_argument("--setting-map", help="write the setting map to this file")
+    parser.add_argument(
+        "--register-map", help="write the Modbus register map to this file"
+    )
+    add_simulator_arguments(parser)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()